@@ -1,74 +1,337 @@
 from datetime import datetime
-from typing import List, Tuple, Optional
-from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Tuple, Optional, Union
 from LLM.base import AsyncLLM
-import tiktoken
+from LLM.errors import LLMError
+from LLM.summarizers import LLMSummarizer, Summarizer
+from LLM.tokens import TokenCounter, get_token_counter
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Messages longer than this are encoded in a worker thread instead of on the event loop
+OFFLOAD_ENCODING_CHARS = 4000
+
+# Put before every summary when the history is rendered as chat messages
+SUMMARY_PREFIX = "Summary of the debate so far:\n"
+
 
-@dataclass
 class Message:
-    content: str
-    timestamp: datetime
-    sender: str
-    is_summary: bool = False
+    """
+    One entry of a conversation history.
+
+    A plain class with __slots__ rather than a dataclass: a process can hold
+    thousands of histories, and slots drop the per-instance __dict__.
+
+    Attributes:
+        content: The text of the message.
+        timestamp: When the message was added.
+        sender: The name of the participant, or "Summary".
+        is_summary: Whether the message summarizes earlier turns.
+        token_count: Computed once when the message enters a ConversationHistory.
+        covers: For summaries, the number of turns summarized, including
+            through merged summaries.
+    """
+
+    __slots__ = ("content", "timestamp", "sender", "is_summary", "token_count", "covers")
+
+    def __init__(
+        self,
+        content: str,
+        timestamp: datetime,
+        sender: str,
+        is_summary: bool = False,
+        token_count: Optional[int] = None,
+        covers: int = 0,
+    ):
+        self.content = content
+        self.timestamp = timestamp
+        self.sender = sender
+        self.is_summary = is_summary
+        self.token_count = token_count
+        self.covers = covers
+
+    def __repr__(self) -> str:
+        return (
+            f"Message(content={self.content!r}, timestamp={self.timestamp!r}, sender={self.sender!r}, "
+            f"is_summary={self.is_summary!r}, token_count={self.token_count!r}, covers={self.covers!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        # The cached token count is not part of a message's identity
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (self.content, self.timestamp, self.sender, self.is_summary, self.covers) == (
+            other.content, other.timestamp, other.sender, other.is_summary, other.covers
+        )
+
+    __hash__ = None
 
 class ConversationHistory:
     def __init__(
         self,
-        summarizer: AsyncLLM,
-        max_token_length: int = 2000
+        summarizer: Union[Summarizer, AsyncLLM],
+        max_token_length: int = 2000,
+        on_summary: Optional[Callable[[Message, int], Awaitable[None]]] = None,
+        keep_recent: int = 4,
+        max_summaries: int = 3,
+        token_counter: Optional[TokenCounter] = None
     ):
         self.messages: List[Message] = []
-        self.summarizer = summarizer
+        # Running sums of the messages' token counts and characters
+        self.total_tokens = 0
+        self.total_chars = 0
+        # A bare LLM is used through the default LLM strategy
+        self.summarizer = LLMSummarizer(summarizer) if isinstance(summarizer, AsyncLLM) else summarizer
         self.max_token_length = max_token_length
-        self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        # Number of latest turns never summarized
+        self.keep_recent = keep_recent
+        # Summaries beyond this are merged into one
+        self.max_summaries = max_summaries
+        # Called with every new summary and the number of later messages it
+        # does not cover, e.g. to persist it
+        self.on_summary = on_summary
+        # Should match the model the history is sent to
+        self.token_counter = token_counter or get_token_counter("openai", "gpt-3.5-turbo")
+        # At most one summarization runs at a time, in the background
+        self._summary_task: Optional[asyncio.Task] = None
+        # Bumped whenever the history is replaced, so a late summary of the old one is dropped
+        self._generation = 0
+        # Kept up to date on every append, so prompts are built without scanning
+        # the history: the last message of every sender, the number of leading
+        # summaries, and renderings created on first use (chat messages per
+        # perspective, transcript lines with a cached joined prefix)
+        self._last: Dict[str, Message] = {}
+        self._last_index: Dict[str, int] = {}
+        self._summary_count = 0
+        self._rendered: Dict[str, List[Dict[str, str]]] = {}
+        self._lines: Optional[List[str]] = None
+        self._joined: Tuple[int, str] = (0, "")
 
     async def add_message(self, content: str, sender: str) -> None:
         new_message = Message(content, datetime.now(), sender)
-        self.messages.append(new_message)
+        await self._measure(new_message)
+        self._append(new_message)
         
-        if self._get_token_count() > self.max_token_length:
-            await self._generate_summary()
+        if self._get_token_count() > self.max_token_length and not self.summarizing and self._has_window():
+            # Turns keep using the full history until the summary is swapped in
+            self._summary_task = asyncio.create_task(self._generate_summary(list(self.messages), self._generation))
+
+    @property
+    def summary_count(self) -> int:
+        """
+        Number of summaries, which always come first in messages.
+        """
+        return self._summary_count
+
+    def _has_window(self) -> bool:
+        # Whether there are turns older than the ones kept verbatim
+        return len(self.messages) - self._summary_count > self.keep_recent
+
+    def _append(self, message: Message) -> None:
+        index = len(self.messages)
+        self.messages.append(message)
+        self.total_tokens += message.token_count
+        self.total_chars += len(message.content)
+        self._last[message.sender] = message
+        self._last_index[message.sender] = index
+        for perspective, rendered in self._rendered.items():
+            rendered.append(self._render(message, perspective))
+        if self._lines is not None:
+            self._lines.append(f"{message.sender}: {message.content}")
+
+    def _reset(self, messages: List[Message]) -> None:
+        # The history was replaced: recompute the pointers and drop the renderings
+        self.messages = []
+        self.total_tokens = 0
+        self.total_chars = 0
+        self._last = {}
+        self._last_index = {}
+        self._rendered = {}
+        self._lines = None
+        self._joined = (0, "")
+        for message in messages:
+            self._append(message)
+        self._summary_count = sum(msg.is_summary for msg in messages)
+
+    @property
+    def summarizing(self) -> bool:
+        """
+        Whether a background summarization is in flight.
+        """
+        return self._summary_task is not None and not self._summary_task.done()
+
+    async def wait_for_summary(self) -> None:
+        """
+        Wait until the in-flight summarization, if any, has finished.
+        """
+        if self._summary_task is not None:
+            await asyncio.shield(self._summary_task)
+
+    def cancel_summary(self) -> None:
+        """
+        Cancel the in-flight summarization, if any, e.g. when the history is discarded.
+        """
+        if self.summarizing:
+            self._summary_task.cancel()
+
+    def set_messages(self, messages: List[Message]) -> None:
+        """
+        Replace the history, e.g. when restoring a session.
+
+        Messages without a cached token count are encoded here, synchronously;
+        restored sessions are built in a worker thread or from snapshots that
+        carry the counts.
+
+        Args:
+            messages: The new history, oldest first.
+        """
+        for msg in messages:
+            if msg.token_count is None:
+                msg.token_count = self.count_tokens(msg.content)
+        self._reset(messages)
+        self._generation += 1
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens of a text, estimating when no tokenizer is available.
+        """
+        return self.token_counter.count(text)
+
+    async def _measure(self, message: Message) -> None:
+        if message.token_count is not None:
+            return
+        if len(message.content) > OFFLOAD_ENCODING_CHARS and self.token_counter.exact:
+            message.token_count = await asyncio.to_thread(self.count_tokens, message.content)
+        else:
+            message.token_count = self.count_tokens(message.content)
 
     def get_last_messages(self, current_llm: str, opponent_llm: str) -> List[Tuple[str, Optional[Message]]]:
-        current_llm_msg = next((msg for msg in reversed(self.messages) if msg.sender == current_llm), None)
-        opponent_llm_msg = next((msg for msg in reversed(self.messages) if msg.sender == opponent_llm), None)
-        return [(current_llm, current_llm_msg), (opponent_llm, opponent_llm_msg)]
+        return [(current_llm, self._last.get(current_llm)), (opponent_llm, self._last.get(opponent_llm))]
+
+    def get_messages(self, perspective: str) -> List[Dict[str, str]]:
+        """
+        Render the history as chat messages from one participant's point of view.
+
+        The participant's own turns become assistant messages and everything
+        else becomes user messages, in order. Because the list only grows at
+        the end (until a summary replaces it), consecutive turns share a stable
+        prefix that providers can serve from their prompt cache.
+
+        The rendering is kept per perspective and extended as messages are
+        added, so only the first call after a summary scans the history.
+
+        Args:
+            perspective: The name of the participant the messages are built for.
+
+        Returns:
+            A list of {"role", "content"} messages. The list is shared with
+            later calls and must not be modified.
+        """
+        rendered = self._rendered.get(perspective)
+        if rendered is None:
+            rendered = [self._render(msg, perspective) for msg in self.messages]
+            self._rendered[perspective] = rendered
+        return rendered
+
+    @staticmethod
+    def _render(msg: Message, perspective: str) -> Dict[str, str]:
+        if msg.is_summary:
+            return {"role": "user", "content": f"{SUMMARY_PREFIX}{msg.content}"}
+        if msg.sender == perspective:
+            return {"role": "assistant", "content": msg.content}
+        return {"role": "user", "content": f"{msg.sender}: {msg.content}"}
 
     def get_history(self) -> str:
+        """
+        Render the history as "sender: content" lines, leaving out the last
+        message of each of the two most recent senders.
+
+        Returns:
+            The transcript, or an empty string with fewer than 3 messages.
+        """
         if len(self.messages) < 3:
             return ""  # Return empty string if there are fewer than 3 messages
 
-        # Get the last two unique senders (current and opponent LLMs)
-        last_senders = list(dict.fromkeys(msg.sender for msg in reversed(self.messages)))[:2]
+        if self._lines is None:
+            self._lines = [f"{msg.sender}: {msg.content}" for msg in self.messages]
+        # The last message of the two most recent senders (current and opponent LLMs)
+        excluded = sorted(self._last_index.values())[-2:]
+        first = excluded[0]
 
-        # Filter out the last message from each of the last two senders
-        filtered_messages = []
-        last_message_indices = {sender: -1 for sender in last_senders}
+        # Every line before the first excluded one is stable, so its joined
+        # text is cached and only extended by the lines added since
+        count, prefix = self._joined
+        if count > first:
+            count, prefix = 0, ""
+        if count < first:
+            added = "\n".join(self._lines[count:first])
+            prefix = f"{prefix}\n{added}" if count else added
+            self._joined = (first, prefix)
 
-        for i, msg in enumerate(reversed(self.messages)):
-            if msg.sender in last_senders:
-                if last_message_indices[msg.sender] == -1:
-                    last_message_indices[msg.sender] = i
-                elif i > last_message_indices[msg.sender]:
-                    filtered_messages.append(msg)
-            else:
-                filtered_messages.append(msg)
+        rest = [line for i, line in enumerate(self._lines[first + 1:], first + 1) if i not in excluded]
+        return "\n".join([prefix] + rest) if first else "\n".join(rest)
 
-        # Reverse the list again to get the correct order
-        filtered_messages.reverse()
+    def _get_token_count(self) -> int:
+        return self.total_tokens
 
-        return "\n".join(f"{msg.sender}: {msg.content}" for msg in filtered_messages)
+    async def _generate_summary(self, snapshot: List[Message], generation: int) -> None:
+        """
+        Compact a snapshot of the history and swap the result in for it.
 
-    def _get_token_count(self) -> int:
-        return sum(len(self.encoding.encode(msg.content)) for msg in self.messages)
+        Only the oldest window of turns is summarized; the last keep_recent
+        turns stay verbatim. Once there are more than max_summaries summaries
+        they are merged into one, so the summarizer input stays bounded by
+        the token limit however long the debate runs. Messages added while
+        the summarizer runs are kept as they are.
 
-    async def _generate_summary(self) -> None:
-        context = "\n".join(f"{msg.sender}: {msg.content}" for msg in self.messages if not msg.is_summary)
-        summary_prompt = f"Summarize the following conversation concisely:\n\n{context}\n\nSummary:"
-        
-        summary_content = ""
-        async for chunk in self.summarizer(summary_prompt):
-            summary_content += chunk
-        
-        summary_message = Message(summary_content, datetime.now(), "Summary", is_summary=True)
-        self.messages = [msg for msg in self.messages if msg.is_summary] + [summary_message]
+        Args:
+            snapshot: A copy of self.messages taken when summarization started.
+            generation: The value of self._generation at that time.
+        """
+        summaries = [msg for msg in snapshot if msg.is_summary]
+        turns = [msg for msg in snapshot if not msg.is_summary]
+        split = len(turns) - self.keep_recent
+        window, recent = turns[:split], turns[split:]
+
+        summary = await self._summarize(
+            self.summarizer.summarize([(msg.sender, msg.content) for msg in window]),
+            covers=len(window),
+        )
+        if summary is None:
+            # Keep the full history and try again on the next message
+            return
+        summaries.append(summary)
+
+        if len(summaries) > self.max_summaries:
+            merged = await self._summarize(
+                self.summarizer.merge([msg.content for msg in summaries]),
+                covers=sum(msg.covers for msg in summaries),
+            )
+            if merged is not None:
+                summaries = [merged]
+
+        if generation != self._generation:
+            logger.info("History was replaced during summarization, discarding the summary")
+            return
+
+        # Messages are only appended, so the snapshot is still a prefix of the history
+        newer = self.messages[len(snapshot):]
+        self._reset(summaries + recent + newer)
+        if self.on_summary is not None:
+            await self.on_summary(summaries[-1], len(recent) + len(newer))
+
+    async def _summarize(self, summary: Awaitable[str], covers: int) -> Optional[Message]:
+        try:
+            summary_content = await summary
+        except LLMError as e:
+            logger.warning(f"Summarization failed, keeping unsummarized history: {e}")
+            return None
+        except Exception:
+            # Nobody awaits this task, so log rather than lose the error
+            logger.exception("Summarization failed unexpectedly, keeping unsummarized history")
+            return None
+
+        summary_message = Message(summary_content, datetime.now(), "Summary", is_summary=True, covers=covers)
+        await self._measure(summary_message)
+        return summary_message
@@ -0,0 +1,115 @@
+"""
+End-to-end latency benchmark for /start_debate, /one_turn_debate and /ws.
+
+Start the backend with the offline provider available, e.g.
+
+    MOCK_LLM_TTFT=0.2 MOCK_LLM_TOKENS_PER_SECOND=80 uvicorn app.main:app
+
+and run this script from the backend directory:
+
+    python -m LLM.Test.benchmark_endpoints --turns 6
+
+Use --concurrency to run several debates side by side.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+import websockets
+
+
+def report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(
+        f"{label:<22} n={len(samples):<4} mean={statistics.mean(samples) * 1000:8.1f}ms "
+        f"p50={statistics.median(samples) * 1000:8.1f}ms p95={p95 * 1000:8.1f}ms"
+    )
+
+
+async def start_debate(client: httpx.AsyncClient, provider: str, summarizer: str, run: int) -> Tuple[int, float]:
+    start = time.perf_counter()
+    response = await client.post("/start_debate", json={
+        "topic": f"Benchmark topic {run}",
+        "name1": "Alice",
+        "name2": "Bob",
+        "provider": provider,
+        "questions": ["Is this benchmark fast enough?"],
+        "answer_length": 100,
+        "summarizer": summarizer,
+    })
+    response.raise_for_status()
+    return response.json()["debate_id"], time.perf_counter() - start
+
+
+async def one_turn(client: httpx.AsyncClient, debate_id: int) -> float:
+    start = time.perf_counter()
+    response = await client.post("/one_turn_debate", params={"debate_id": debate_id})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def websocket_turns(url: str, turns: int, ttfts: List[float], totals: List[float]) -> None:
+    async with websockets.connect(url) as websocket:
+        for _ in range(turns):
+            start = time.perf_counter()
+            first = None
+            await websocket.send("next")
+            while True:
+                message = await websocket.recv()
+                if message == "<END_WEBSOCKET_TOKEN>":
+                    break
+                if first is None and "chunk" in json.loads(message):
+                    first = time.perf_counter() - start
+            ttfts.append(first or 0.0)
+            totals.append(time.perf_counter() - start)
+
+
+async def run_debate(
+    client: httpx.AsyncClient, args: argparse.Namespace, run: int, ws_url: str, results: Dict[str, List[float]]
+) -> None:
+    debate_id, elapsed = await start_debate(client, args.provider, args.summarizer, run)
+    results["start"].append(elapsed)
+    for _ in range(args.turns):
+        results["turn"].append(await one_turn(client, debate_id))
+    await websocket_turns(f"{ws_url}?debate_id={debate_id}", args.turns, results["ws_ttft"], results["ws_total"])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--provider", default="mock")
+    parser.add_argument("--summarizer", default="llm", choices=["llm", "extractive"])
+    parser.add_argument("--debates", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=1, help="debates run at the same time")
+    args = parser.parse_args()
+
+    ws_url = args.base_url.replace("http", "ws", 1) + "/ws"
+    results: Dict[str, List[float]] = {"start": [], "turn": [], "ws_ttft": [], "ws_total": []}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(client: httpx.AsyncClient, run: int) -> None:
+        async with semaphore:
+            await run_debate(client, args, run, ws_url, results)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(client, run) for run in range(args.debates)))
+        elapsed = time.perf_counter() - start
+
+    report("/start_debate", results["start"])
+    report("/one_turn_debate", results["turn"])
+    report("/ws first chunk", results["ws_ttft"])
+    report("/ws full turn", results["ws_total"])
+    print(f"{args.debates} debates in {elapsed:.1f}s with concurrency {args.concurrency}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the per-turn work ConversationHistory does as a debate
+grows: add_message, then rendering the prompt history for the next speaker.
+
+add_message keeps a running total of cached per-message counts and the
+prompt messages are extended incrementally, so both should stay flat. The
+get_history transcript only joins the lines added since the previous call,
+but returning one string still copies the whole text. The "full recount"
+column shows what re-encoding the whole history on every turn costs at the
+same length.
+
+Run it from the backend directory:
+
+    python -m LLM.Test.benchmark_history_tokens --turns 2000
+
+Without the tiktoken encoding (it is downloaded on first use) counts are
+estimated from the text length and both columns are much cheaper.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import app  # noqa: F401  (initializes the app package before the LLM modules)
+from LLM.ConversationHandler import ConversationHistory
+
+WORDS = "the quick brown fox argues that lazy dogs make terrible debate partners".split()
+
+
+def report(turn: int, samples: Dict[str, List[float]], recount: float) -> None:
+    medians = "  ".join(f"{name}={statistics.median(values) * 1e6:7.1f}us" for name, values in samples.items())
+    print(f"turn {turn:>6}  median {medians}  full recount={recount * 1e6:8.1f}us")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=150, help="words per turn")
+    parser.add_argument("--every", type=int, default=250, help="report every N turns")
+    args = parser.parse_args()
+
+    # The summarizer is never called: the limit is out of reach
+    history = ConversationHistory(summarizer=None, max_token_length=10 ** 12)
+    print("encoding:", "tiktoken" if history.token_counter.exact else "length estimate")
+    content = " ".join(WORDS[i % len(WORDS)] for i in range(args.words))
+
+    samples: Dict[str, List[float]] = {"add_message": [], "prompt": [], "get_history": []}
+
+    def measure(name: str, fn: Callable[[], object]) -> None:
+        start = time.perf_counter()
+        fn()
+        samples[name].append(time.perf_counter() - start)
+
+    for turn in range(1, args.turns + 1):
+        speaker, next_speaker = ("Alice", "Bob") if turn % 2 else ("Bob", "Alice")
+        start = time.perf_counter()
+        await history.add_message(content, speaker)
+        samples["add_message"].append(time.perf_counter() - start)
+        measure("prompt", lambda: (history.get_messages(next_speaker), history.get_last_messages(next_speaker, speaker)))
+        measure("get_history", history.get_history)
+
+        if turn % args.every == 0:
+            start = time.perf_counter()
+            sum(history.count_tokens(msg.content) for msg in history.messages)
+            report(turn, samples, time.perf_counter() - start)
+            samples = {name: [] for name in samples}
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
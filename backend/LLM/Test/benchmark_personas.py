@@ -0,0 +1,102 @@
+"""
+Benchmark of persona generation on a cache miss: both personas in one
+completion ("combined") against one concurrent call per persona
+("concurrent"). It then sends the same request from several clients at once;
+they share a single generation. Finally it times the lookup of a stored pair
+in the Persona table against the in-process cache in front of it.
+
+Run it from the backend directory with the offline provider, e.g.
+
+    MOCK_LLM_TTFT=0.5 MOCK_LLM_TOKENS_PER_SECOND=80 MOCK_LLM_PERSONA_TOKENS=300 \
+        python -m LLM.Test.benchmark_personas
+
+Every run uses a fresh topic so neither the Persona table nor the response
+cache can answer it; the personas it creates are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import List
+
+import app  # noqa: F401  (initializes the app package before the LLM modules)
+from app.database import PersonaSessionLocal, create_tables
+from app.models import Persona
+from app.personas import get_persona_cache, get_persona_flights, lookup_personas
+from LLM.async_utils import find_personas, generate_debate_personas
+
+
+async def measure(mode: str, provider: str, repeat: int, topics: List[str]) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        topic = f"Benchmark topic {uuid.uuid4().hex}"
+        topics.append(topic)
+        with PersonaSessionLocal() as persona_db:
+            start = time.perf_counter()
+            await generate_debate_personas(topic, "Alice", "Bob", persona_db, provider=provider, mode=mode)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def measure_shared(clients: int, provider: str, topics: List[str]) -> float:
+    topic = f"Benchmark topic {uuid.uuid4().hex}"
+    topics.append(topic)
+
+    async def request() -> None:
+        with PersonaSessionLocal() as persona_db:
+            await generate_debate_personas(topic, "Alice", "Bob", persona_db, provider=provider)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(clients)))
+    return time.perf_counter() - start
+
+
+def measure_lookup(topic: str, provider: str, repeat: int = 1000) -> None:
+    key = (topic, "Alice", "Bob", 400, provider)
+    with PersonaSessionLocal() as persona_db:
+        lookup_personas(persona_db, key)
+        for name, lookup in (
+            ("database", lambda: find_personas(persona_db, *key)),
+            ("cache", lambda: lookup_personas(persona_db, key)),
+        ):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                lookup()
+            print(f"stored pair lookup ({name}): {(time.perf_counter() - start) / repeat * 1e6:8.1f}us")
+    print("persona cache:", get_persona_cache().stats())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="mock")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=8, help="simultaneous requests for the same pair")
+    args = parser.parse_args()
+
+    create_tables()
+    topics: List[str] = []
+    try:
+        results = {}
+        for mode in ("combined", "concurrent"):
+            results[mode] = await measure(mode, args.provider, args.repeat, topics)
+            samples = results[mode]
+            print(f"{mode:<12} median={statistics.median(samples) * 1000:8.1f}ms max={max(samples) * 1000:8.1f}ms")
+        speedup = statistics.median(results["combined"]) / statistics.median(results["concurrent"])
+        print(f"concurrent is {speedup:.2f}x faster")
+
+        flights = get_persona_flights()
+        generated = flights.generated
+        elapsed = await measure_shared(args.clients, args.provider, topics)
+        print(f"{args.clients} simultaneous requests: {elapsed * 1000:.1f}ms, {flights.generated - generated} generation(s)")
+
+        measure_lookup(topics[-1], args.provider)
+    finally:
+        with PersonaSessionLocal() as persona_db:
+            persona_db.query(Persona).filter(Persona.topic.in_(topics)).delete(synchronize_session=False)
+            persona_db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark of rebuilding a debate session after a restart, for debates of
+increasing length: from the database rows (DebateSession.from_database) and
+from a stored snapshot (DatabaseSessionStore).
+
+Run it from the backend directory:
+
+    python -m LLM.Test.benchmark_rebuild --turns 10 100 1000
+
+The debates it creates are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import app  # noqa: F401  (initializes the app package before the LLM modules)
+from app.database import DebateSessionLocal, create_tables
+from app.models import Debate, DebateSessionState, DebateSummary, DebateTurn
+from app.session_store import DatabaseSessionStore
+from app.sessions import DebateSession
+
+WORDS = "the quick brown fox argues that lazy dogs make terrible debate partners".split()
+
+
+def create_debate(turns: int, words_per_turn: int, summary_every: int) -> int:
+    """
+    Insert a mock debate with the given number of completed turns.
+
+    Returns:
+        The id of the new debate.
+    """
+    with DebateSessionLocal() as db:
+        debate = Debate(
+            topic="Rebuild benchmark",
+            name1="Alice",
+            name2="Bob",
+            provider="mock",
+            questions=json.dumps(["Is rebuilding fast enough?"]),
+            answer_length=words_per_turn,
+            persona1=json.dumps({"name": "Alice", "system_prompt": "You are Alice."}),
+            persona2=json.dumps({"name": "Bob", "system_prompt": "You are Bob."}),
+        )
+        db.add(debate)
+        db.commit()
+
+        content = " ".join(WORDS[i % len(WORDS)] for i in range(words_per_turn))
+        for turn in range(turns):
+            db.add(DebateTurn(
+                debate_id=debate.id,
+                speaker="Alice" if turn % 2 == 0 else "Bob",
+                content=content,
+                prompt="[]",
+                turn_number=turn,
+            ))
+            if summary_every and turn % summary_every == summary_every - 1:
+                db.add(DebateSummary(debate_id=debate.id, content=content, turn_number=turn))
+        db.commit()
+        return debate.id
+
+
+def delete_debate(debate_id: int) -> None:
+    with DebateSessionLocal() as db:
+        for model in (DebateTurn, DebateSummary, DebateSessionState):
+            db.query(model).filter(model.debate_id == debate_id).delete()
+        db.query(Debate).filter(Debate.id == debate_id).delete()
+        db.commit()
+
+
+def measure(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label: str, samples: List[float]) -> None:
+    print(f"{label:<28} median={statistics.median(samples) * 1000:8.2f}ms max={max(samples) * 1000:8.2f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--words", type=int, default=150, help="words per turn")
+    parser.add_argument("--summary-every", type=int, default=0,
+                        help="persist a summary every N turns (0: no summaries, full history)")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    create_tables()
+    store = DatabaseSessionStore()
+    for turns in args.turns:
+        debate_id = create_debate(turns, args.words, args.summary_every)
+        try:
+            session = DebateSession.from_database(debate_id)
+            await store.save(session.to_snapshot())
+
+            print(f"{turns} turns, {len(session.history.messages)} history messages")
+            report("  from database rows", measure(lambda: DebateSession.from_database(debate_id), args.repeat))
+            snapshot_samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                DebateSession.from_snapshot(await store.load(debate_id))
+                snapshot_samples.append(time.perf_counter() - start)
+            report("  from stored snapshot", snapshot_samples)
+        finally:
+            delete_debate(debate_id)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
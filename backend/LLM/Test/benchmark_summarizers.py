@@ -0,0 +1,70 @@
+"""
+Benchmark of the history summarizers: latency and how many tokens a summary
+of a window of turns saves, for the LLM summarizer and the local extractive
+one.
+
+Without API keys, use the offline provider for the LLM summarizer, e.g.
+
+    MOCK_LLM_TTFT=0.5 MOCK_LLM_TOKENS_PER_SECOND=80 python -m LLM.Test.benchmark_summarizers --provider mock
+
+from the backend directory. Token counts are estimated from the text length.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+import app  # noqa: F401  (initializes the app package before the LLM modules)
+from LLM.base import AsyncLLM
+from LLM.mock import WORDS
+from LLM.rate_limit import estimate_tokens
+from LLM.summarizers import ExtractiveSummarizer, LLMSummarizer, Summarizer
+
+
+def make_turns(count: int, sentences_per_turn: int, seed: int) -> List[Tuple[str, str]]:
+    """
+    Build synthetic debate turns of random sentences.
+    """
+    rng = random.Random(seed)
+    turns = []
+    for i in range(count):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(sentences_per_turn)
+        ]
+        turns.append(("Alice" if i % 2 == 0 else "Bob", " ".join(sentences)))
+    return turns
+
+
+async def run(name: str, summarizer: Summarizer, windows: List[List[Tuple[str, str]]]) -> None:
+    latencies, reductions = [], []
+    for turns in windows:
+        input_tokens = sum(estimate_tokens(f"{sender}: {content}") for sender, content in turns)
+        start = time.perf_counter()
+        summary = await summarizer.summarize(turns)
+        latencies.append(time.perf_counter() - start)
+        reductions.append(1 - estimate_tokens(summary) / input_tokens)
+    print(
+        f"{name:<12} median={statistics.median(latencies) * 1000:9.2f}ms max={max(latencies) * 1000:9.2f}ms "
+        f"tokens saved={statistics.mean(reductions) * 100:5.1f}%"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="mock", help="provider of the LLM summarizer")
+    parser.add_argument("--turns", type=int, default=12, help="turns per summarized window")
+    parser.add_argument("--sentences", type=int, default=8, help="sentences per turn")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    windows = [make_turns(args.turns, args.sentences, seed) for seed in range(args.repeat)]
+    await run("extractive", ExtractiveSummarizer(), windows)
+    await run("llm", LLMSummarizer(AsyncLLM(args.provider, name="summarizer")), windows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Benchmark of the near-duplicate topic index used to reuse personas: time to
+index past topics, query latency, and recall of the MinHash/LSH candidates
+against comparing the query with every topic.
+
+Run it from the backend directory:
+
+    python -m LLM.Test.benchmark_topics --topics 10000 --threshold 0.9
+
+Topics are random phrases; every query is a stored topic with its case and
+punctuation changed and, half of the time, one letter, the kind of variant
+the index exists to catch.
+"""
+
+import argparse
+import random
+import string
+import time
+
+from LLM.topics import MinHashIndex, jaccard, normalize_topic, shingles, similarity
+
+WORDS = (
+    "should governments regulate artificial intelligence remote work office "
+    "nuclear energy climate change social media teenagers voting age pizza "
+    "pineapple universal basic income space exploration public transport"
+).split()
+
+
+def make_variant(rng: random.Random, topic: str) -> str:
+    if rng.random() < 0.5:
+        position = rng.randrange(len(topic))
+        topic = topic[:position] + rng.choice(string.ascii_lowercase) + topic[position + 1:]
+    return topic.title() + rng.choice(["?", "!", " ?", "..."])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    topics = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 10))) for _ in range(args.topics)]
+
+    index = MinHashIndex()
+    start = time.perf_counter()
+    for item, topic in enumerate(topics):
+        index.add(item, topic)
+    print(f"indexed {args.topics} topics in {time.perf_counter() - start:.2f}s")
+
+    normalized_topics = [normalize_topic(topic) for topic in topics]
+    topic_shingles = [shingles(topic) for topic in normalized_topics]
+    found = expected = 0
+    elapsed = 0.0
+    for item in rng.sample(range(args.topics), args.queries):
+        query = make_variant(rng, topics[item])
+        normalized = normalize_topic(query)
+        query_shingles = shingles(normalized)
+        # Brute force; the Jaccard similarity bounds similarity(), so it prefilters
+        truth = {
+            other
+            for other, topic in enumerate(normalized_topics)
+            if jaccard(query_shingles, topic_shingles[other]) >= args.threshold
+            and similarity(normalized, topic) >= args.threshold
+        }
+        start = time.perf_counter()
+        matches = {match for _, match in index.query(query, args.threshold)}
+        elapsed += time.perf_counter() - start
+        expected += len(truth)
+        found += len(truth & matches)
+    recall = found / expected if expected else 1.0
+    print(f"query mean={elapsed / args.queries * 1000:.2f}ms recall={recall:.3f} ({found}/{expected} matches)")
+
+
+if __name__ == "__main__":
+    main()
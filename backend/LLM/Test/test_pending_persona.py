@@ -0,0 +1,84 @@
+"""
+A debate whose second persona was never stored (the worker generating it
+restarted or failed) must still progress: rebuilding its session from the
+database leaves the persona pending, and the second speaker's turn starts
+the generation again.
+
+Runs offline with the mock provider, from the backend directory:
+
+    PYTHONPATH=. python -m pytest LLM/Test/test_pending_persona.py
+    PYTHONPATH=. python -m LLM.Test.test_pending_persona
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+os.environ.setdefault("MOCK_LLM_TTFT", "0")
+os.environ.setdefault("MOCK_LLM_TOKENS_PER_SECOND", "0")
+os.environ.setdefault("MOCK_LLM_ERROR_RATE", "0")
+
+import app  # noqa: E402,F401  (initializes the app package before the LLM modules)
+from app.database import DebateSessionLocal, PersonaSessionLocal, create_tables  # noqa: E402
+from app.models import Debate, DebateSessionState, DebateTurn, Persona  # noqa: E402
+from app.routes.debate import generate_debate_response  # noqa: E402
+from app.sessions import DebateSession  # noqa: E402
+from LLM.deadlines import Deadline  # noqa: E402
+
+
+async def run_pending_persona_turns() -> None:
+    create_tables()
+    topic = f"Pending persona test {uuid.uuid4().hex}"
+    with DebateSessionLocal() as debate_db:
+        debate = Debate(
+            topic=topic,
+            name1="Bob",
+            name2="Alice",
+            provider="mock",
+            questions=json.dumps(["Who is right?"]),
+            answer_length=50,
+            persona1=json.dumps({"name": "Alice", "system_prompt": "You are Alice."}),
+            persona2=None,
+        )
+        debate_db.add(debate)
+        debate_db.commit()
+        debate_id = debate.id
+
+    try:
+        session = DebateSession.from_database(debate_id)
+        assert session is not None
+        assert session.persona_task is None
+        assert session.llm2.name == "Bob" and session.llm2.system_prompt is None
+
+        with DebateSessionLocal() as debate_db, PersonaSessionLocal() as persona_db:
+            for speaker in ("Alice", "Bob"):
+                chunks = []
+                async with session.lock:
+                    async for chunk in generate_debate_response(session, debate_db, persona_db, deadline=Deadline(total=30)):
+                        chunks.append(chunk)
+                assert chunks and all(chunk["name"] == speaker for chunk in chunks)
+
+        assert session.turn_count == 2
+        assert session.llm2.name == "Bob" and session.llm2.system_prompt
+        with DebateSessionLocal() as debate_db:
+            stored = json.loads(debate_db.get(Debate, debate_id).persona2)
+        assert stored == {"name": "Bob", "system_prompt": session.llm2.system_prompt}
+    finally:
+        with DebateSessionLocal() as debate_db:
+            debate_db.query(DebateTurn).filter(DebateTurn.debate_id == debate_id).delete(synchronize_session=False)
+            debate_db.query(DebateSessionState).filter(DebateSessionState.debate_id == debate_id).delete(synchronize_session=False)
+            debate_db.query(Debate).filter(Debate.id == debate_id).delete(synchronize_session=False)
+            debate_db.commit()
+        with PersonaSessionLocal() as persona_db:
+            persona_db.query(Persona).filter(Persona.topic == topic).delete(synchronize_session=False)
+            persona_db.commit()
+
+
+def test_pending_persona_is_generated_again():
+    asyncio.run(run_pending_persona_turns())
+
+
+if __name__ == "__main__":
+    test_pending_persona_is_generated_again()
+    print("Pending persona test passed")
@@ -1,11 +1,16 @@
 import os, re
+import asyncio
 import json
-from typing import Tuple, Dict, Literal, List
+from typing import AsyncGenerator, Tuple, Dict, Literal, List, Optional
 from LLM.base import AsyncLLM
-from LLM.prompts.Persona import SET_PERSONA
+from LLM.prompts.Persona import SET_PERSONA, SET_SINGLE_PERSONA
 from app.models import Persona
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
+# Columns identifying a persona pair, in the order of its cache key
+PERSONA_KEY_COLUMNS = ("topic", "name1", "name2", "answer_length", "provider")
+
 
 async def generate_debate_personas(
     debate_topic: str,
@@ -14,12 +19,60 @@ async def generate_debate_personas(
     persona_db: Session,
     answer_length: int = 400,
     provider: Literal["openai", "claude"] = "openai",
+    mode: Literal["combined", "concurrent"] = "combined",
 ) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Return the personas of a debate, generating them unless they are stored
+    for the same or a near-duplicate topic.
+
+    Args:
+        debate_topic: The topic of the debate.
+        name1: Name of one debater.
+        name2: Name of the other debater.
+        persona_db: Session of the persona database.
+        answer_length: Maximum number of words per answer.
+        provider: The LLM provider generating the personas.
+        mode: "combined" asks for both personas in one completion;
+            "concurrent" generates each in its own call, at the same time,
+            so the wait is that of the longer persona instead of both.
+
+    Returns:
+        The two personas as {"name", "system_prompt"} dicts, in the sorted
+        order of the names.
+    """
     # Ensure name1 and name2 are always in the same order
     sorted_names = sorted([name1, name2])
     name1, name2 = sorted_names
 
-    # Check if personas exist in the database
+    # Imported here: app.personas builds on this module
+    from app.personas import find_similar_personas, get_persona_flights, lookup_personas
+
+    key = (debate_topic, name1, name2, answer_length, provider)
+    existing_personas = lookup_personas(persona_db, key) or await find_similar_personas(persona_db, key)
+    if existing_personas:
+        return existing_personas
+
+    # End the read transaction so the pooled connection is not held while the LLM generates
+    persona_db.commit()
+
+    # Joins a generation of the same pair already running, which also stores it
+    generation = get_persona_flights().generate(key, mode)
+    return await asyncio.shield(generation.done)
+
+def find_personas(
+    persona_db: Session,
+    debate_topic: str,
+    name1: str,
+    name2: str,
+    answer_length: int,
+    provider: str,
+) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+    """
+    Look up previously generated personas; name1 and name2 must be sorted.
+
+    Returns:
+        The two personas as {"name", "system_prompt"} dicts, or None.
+    """
     existing_persona = persona_db.query(Persona).filter(
         Persona.topic == debate_topic,
         Persona.name1 == name1,
@@ -28,52 +81,143 @@ async def generate_debate_personas(
         Persona.provider == provider
     ).first()
 
-    if existing_persona:
-        return (
-            {"name": existing_persona.persona1_name, "system_prompt": existing_persona.persona1_system_prompt},
-            {"name": existing_persona.persona2_name, "system_prompt": existing_persona.persona2_system_prompt}
+    if existing_persona is None:
+        return None
+    return (
+        {"name": existing_persona.persona1_name, "system_prompt": existing_persona.persona1_system_prompt},
+        {"name": existing_persona.persona2_name, "system_prompt": existing_persona.persona2_system_prompt}
+    )
+
+def save_personas(
+    persona_db: Session,
+    debate_topic: str,
+    name1: str,
+    name2: str,
+    answer_length: int,
+    provider: str,
+    personas: List[Dict[str, str]],
+) -> None:
+    """
+    Store generated personas for later debates; name1 and name2 must be sorted.
+
+    A pair already stored under the same key is kept.
+    """
+    persona_db.execute(
+        insert(Persona)
+        .values(
+            topic=debate_topic,
+            name1=name1,
+            name2=name2,
+            persona1_name=personas[0]["name"],
+            persona2_name=personas[1]["name"],
+            persona1_system_prompt=personas[0]["system_prompt"],
+            persona2_system_prompt=personas[1]["system_prompt"],
+            answer_length=answer_length,
+            provider=provider
         )
+        .on_conflict_do_nothing(index_elements=PERSONA_KEY_COLUMNS)
+    )
+    persona_db.commit()
+
+async def stream_personas(
+    debate_topic: str,
+    name1: str,
+    name2: str,
+    answer_length: int,
+    provider: str,
+    mode: Literal["combined", "concurrent"] = "combined",
+) -> AsyncGenerator[Dict[str, str], None]:
+    """
+    Generate the personas of name1 and name2, yielding each one as soon as it
+    is complete, in that order.
+
+    In "combined" mode the completion is streamed and every <persona>
+    element is parsed the moment its closing tag arrives. In "concurrent"
+    mode each persona has its own call; each call knows the topic, the
+    opponent and its own stance, so the two come out opposed without seeing
+    each other.
+
+    Yields:
+        The personas as {"name", "system_prompt"} dicts.
+    """
+    # No completion cache: a malformed reply would be replayed on every retry,
+    # and the Persona table already keeps the pairs that parsed
+    if mode == "concurrent":
+        llm = AsyncLLM(provider=provider, stream=False)
+        calls = [
+            asyncio.ensure_future(_complete(llm, SET_SINGLE_PERSONA.format(
+                debate_topic=debate_topic,
+                name=name,
+                opponent=opponent,
+                stance=stance,
+                answer_length=answer_length
+            )))
+            for name, opponent, stance in ((name1, name2, "In favour of"), (name2, name1, "Against"))
+        ]
+        try:
+            for call in calls:
+                extracted = extract_persona_data(await call)
+                if len(extracted) != 1:
+                    raise ValueError(f"Expected 1 persona per call, but got {len(extracted)}")
+                yield extracted[0]
+        finally:
+            # If one call failed or the consumer stopped, the other persona is of no use
+            for call in calls:
+                call.cancel()
+        return
 
-    # Generate new personas
     prompt = SET_PERSONA.format(
         debate_topic=debate_topic,
         name1=name1,
         name2=name2,
         answer_length=answer_length
     )
+    llm = AsyncLLM(provider=provider, stream=True)
+    parser = PersonaStreamParser()
+    stream = llm(user_prompt=prompt)
+    try:
+        async for chunk in stream:
+            for persona in parser.feed(chunk):
+                yield persona
+    finally:
+        await stream.aclose()
 
-    llm = AsyncLLM(provider=provider, stream=False)
+async def _complete(llm: AsyncLLM, prompt: str) -> str:
     response = ""
     async for chunk in llm(user_prompt=prompt):
         response += chunk
-    
-    personas = extract_persona_data(response)
+    return response
 
-    if len(personas) != 2:
-        raise ValueError(f"Expected 2 personas, but got {len(personas)}")
 
-    # Save new personas to the database
-    new_persona = Persona(
-        topic=debate_topic,
-        name1=name1,
-        name2=name2,
-        persona1_name=personas[0]["name"],
-        persona2_name=personas[1]["name"],
-        persona1_system_prompt=personas[0]["system_prompt"],
-        persona2_system_prompt=personas[1]["system_prompt"],
-        answer_length=answer_length,
-        provider=provider
-    )
-    persona_db.add(new_persona)
-    persona_db.commit()
+class PersonaStreamParser:
+    """
+    Extracts <persona> elements from an XML document that arrives in chunks.
+    """
 
-    return tuple(
-        {
-            "name": persona["name"],
-            "system_prompt": persona["system_prompt"]
-        }
-        for persona in personas
-    )
+    CLOSING_TAG = "</persona>"
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """
+        Add a chunk of the document.
+
+        Returns:
+            The personas whose closing tag arrived with this chunk, as
+            {"name", "system_prompt"} dicts.
+        """
+        # A closing tag may straddle the previous chunk
+        search_from = max(0, len(self._buffer) - len(self.CLOSING_TAG) + 1)
+        self._buffer += chunk
+        personas = []
+        end = self._buffer.find(self.CLOSING_TAG, search_from)
+        while end != -1:
+            end += len(self.CLOSING_TAG)
+            personas.extend(extract_persona_data(self._buffer[:end]))
+            self._buffer = self._buffer[end:]
+            end = self._buffer.find(self.CLOSING_TAG)
+        return personas
 
 def extract_persona_data(xml_string: str) -> List[Dict[str, str]]:
     """
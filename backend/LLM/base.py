@@ -1,14 +1,68 @@
 """
 This module provides a unified interface for interacting with different Language
 Model providers, specifically OpenAI and Anthropic's Claude, using async clients.
+An offline "mock" provider is also available for load testing.
 """
 
-import os
-from typing import Literal, Optional, AsyncGenerator
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Literal, Optional, AsyncGenerator, Tuple, Union
 
-from anthropic import AsyncAnthropic
-from openai import AsyncOpenAI
-from dotenv import load_dotenv
+import anthropic
+import openai
+
+from LLM.cache import CompletionCache
+from LLM.cassette import Cassette, get_default_cassette
+from LLM.clients import get_client
+from LLM.deadlines import Deadline, enforce_deadline
+from LLM.errors import LLMTimeoutError, ProviderError
+from LLM.hedging import HedgePolicy, get_hedge_stats, hedged_stream, ttft_tracker
+from LLM.metrics import CallMetrics, emit
+from LLM.mock import MockProviderError
+from LLM.rate_limit import estimate_tokens, get_rate_limiter
+from LLM.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4o-mini",
+    "claude": "claude-3-5-sonnet-20240620",
+    "mock": "mock-1",
+}
+
+# A single user prompt, or a conversation of {"role", "content"} messages
+Prompt = Union[str, List[Dict[str, str]]]
+
+
+def as_messages(prompt: Prompt) -> List[Dict[str, str]]:
+    """
+    Normalize a prompt into a list of {"role", "content"} messages.
+
+    Args:
+        prompt: A user prompt or a list of messages.
+
+    Returns:
+        The list of messages.
+    """
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return list(prompt)
+
+
+def prompt_text(prompt: Prompt) -> str:
+    """
+    Flatten a prompt into plain text, e.g. for token estimates.
+
+    Args:
+        prompt: A user prompt or a list of messages.
+
+    Returns:
+        The message contents joined by blank lines.
+    """
+    return "\n\n".join(message["content"] for message in as_messages(prompt))
 
 
 class AsyncLLM:
@@ -17,137 +71,585 @@ class AsyncLLM:
 
     This class provides a unified interface for making async calls to either OpenAI
     or Anthropic's Claude API, handling both streaming and non-streaming
-    responses.
+    responses. Prompts may be a single user string or a multi-turn message
+    list; conversations are sent so that their prefix stays stable across
+    turns and can be served from the provider's prompt cache. Transient
+    provider errors are retried with backoff as long as no chunk has been
+    emitted; once the retries are exhausted, still before any chunk, the
+    call can fail over to a second provider.
     """
 
     def __init__(
         self,
-        provider: Literal["openai", "claude"],
+        provider: Literal["openai", "claude", "mock"],
         name: Optional[str] = None,
         stream: bool = True,
         model: Optional[str] = None,
         max_tokens: int = 1000,
         temperature: float = 0.7,
         system_prompt: str = "You are a helpful AI assistant.",
+        cassette: Optional[Cassette] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        fallback_provider: Optional[Literal["openai", "claude", "mock"]] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        cache: Optional[CompletionCache] = None,
+        debate_id: Optional[int] = None,
     ):
         """
         Initialize the AsyncLLM object.
 
         Args:
-            provider: The LLM provider to use ("openai" or "claude").
+            provider: The LLM provider to use ("openai", "claude" or "mock").
             name: The LLM name, usually the name of the persona.
             stream: Whether to stream the response or not.
             model: The specific model to use.
             max_tokens: The maximum number of tokens to generate.
             temperature: Controls randomness in the output (0.0 to 1.0).
             system_prompt: The system prompt to use for all conversations.
+            cassette: Records or replays response streams; defaults to the
+                cassette configured through LLM_CASSETTE_* variables.
+            retry_policy: Backoff applied to transient errors; defaults to the
+                policy configured through LLM_RETRY_* variables.
+            fallback_provider: Provider to fail over to, with its default model
+                and the same system prompt, once retries are exhausted.
+            hedge_policy: Sends a second request when the first chunk is late;
+                defaults to the policy configured through LLM_HEDGE_* variables
+                (disabled unless LLM_HEDGE_ENABLED is set).
+            cache: Completion cache consulted before calling the provider;
+                pass LLM.cache.get_default_cache() to share the process cache.
+            debate_id: The debate this LLM takes part in, used to tag metrics.
 
         Raises:
             ValueError: If the provider is invalid or API key is missing.
         """
-        load_dotenv()
+        if provider not in DEFAULT_MODELS:
+            raise ValueError("Invalid provider. Choose 'openai', 'claude' or 'mock'.")
         self.provider = provider
         self.name = name
         self.stream = stream
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.system_prompt = system_prompt
-
-        if provider == "openai":
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise ValueError("OPENAI_API_KEY not found in environment variables")
-            self.client = AsyncOpenAI(api_key=api_key)
-            self.model = model or "gpt-4o-mini"
-        elif provider == "claude":
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-            self.client = AsyncAnthropic(api_key=api_key)
-            self.model = model or "claude-3-5-sonnet-20240620"
-        else:
-            raise ValueError("Invalid provider. Choose 'openai' or 'claude'.")
-
-    async def __call__(self, user_prompt: str) -> AsyncGenerator[str, None]:
+        self.cassette = cassette or get_default_cassette()
+        self.retry_policy = retry_policy or RetryPolicy.from_env()
+        self.fallback_provider = fallback_provider if fallback_provider != provider else None
+        self.hedge_policy = hedge_policy or HedgePolicy.from_env()
+        self.cache = cache
+        self.debate_id = debate_id
+        self.last_usage: Optional[Dict[str, int]] = None
+
+        # Replaying needs no live client, so it works without API keys
+        replaying = self.cassette is not None and self.cassette.mode == "replay"
+        self.client = None if replaying else get_client(provider)
+        self.model = model or DEFAULT_MODELS[provider]
+
+    async def __call__(
+        self, user_prompt: Prompt, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
         """
         Call the LLM with a user prompt asynchronously.
 
+        After the call, last_usage holds the provider-reported token usage,
+        including how many input tokens were served from the prompt cache.
+
         Args:
-            user_prompt: The input prompt from the user.
+            user_prompt: The input prompt from the user, or a list of
+                {"role": "user" | "assistant", "content": str} messages
+                ending with a user message.
+            deadline: Time limits of the call, shared by its retries, failover
+                and hedge requests; no limits when None.
 
         Returns:
             An AsyncGenerator yielding the response chunks.
+
+        Closing the returned generator early (e.g. when the client disconnects)
+        closes the provider stream and its HTTP response right away.
+
+        Raises:
+            ProviderError: If the call failed and could not be retried.
+            LLMTimeoutError: If the deadline expired.
         """
-        if self.provider == "openai":
-            async for chunk in self._call_openai(user_prompt):
+        if self.cache is None:
+            stream = self._call_uncached(user_prompt, deadline)
+            try:
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                await stream.aclose()
+            return
+
+        key = self.request_key(user_prompt)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            if self.stream:
+                async for chunk in self.cache.replay(cached):
+                    yield chunk
+            else:
+                yield cached
+            return
+
+        completion = ""
+        stream = self._call_uncached(user_prompt, deadline)
+        try:
+            async for chunk in stream:
+                completion += chunk
                 yield chunk
-        else:
-            async for chunk in self._call_claude(user_prompt):
+        finally:
+            await stream.aclose()
+        await self.cache.put(key, completion)
+
+    async def _call_uncached(
+        self, user_prompt: Prompt, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Call the LLM, or its cassette, without consulting the completion cache.
+
+        Args:
+            user_prompt: The user prompt or message list.
+            deadline: Time limits of the call.
+
+        Yields:
+            Chunks of the response as they become available.
+        """
+        if self.cassette is not None and self.cassette.mode == "replay":
+            async for chunk in self.cassette.replay(self.request_key(user_prompt)):
                 yield chunk
+            return
+
+        stream = self._call_with_retries(user_prompt, deadline)
+        if self.cassette is not None:
+            stream = self.cassette.record(
+                self.request_key(user_prompt),
+                stream,
+                metadata={"provider": self.provider, "model": self.model},
+            )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    def request_key(self, user_prompt: Prompt) -> str:
+        """
+        Compute a stable key identifying a request and its generation settings.
+
+        Args:
+            user_prompt: The user prompt or message list.
+
+        Returns:
+            A hex digest of provider, model, prompts, temperature and max_tokens.
+        """
+        payload = json.dumps(
+            [self.provider, self.model, self.system_prompt, user_prompt,
+             self.temperature, self.max_tokens, self.stream],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _routes(self) -> Iterator[Tuple[str, Any, str]]:
+        """
+        Yield the (provider, client, model) combinations to try, in order.
+        """
+        yield self.provider, self.client, self.model
+        if self.fallback_provider is not None:
+            try:
+                client = get_client(self.fallback_provider)
+            except ValueError as e:
+                logger.warning(f"Cannot fail over to {self.fallback_provider}: {e}")
+                return
+            yield self.fallback_provider, client, DEFAULT_MODELS[self.fallback_provider]
+
+    async def _call_with_retries(
+        self, user_prompt: Prompt, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Call the providers in order, retrying transient errors before the first chunk.
+
+        Args:
+            user_prompt: The user prompt or message list.
+            deadline: Time limits of the call; no retry starts once its total
+                time has run out.
+
+        Yields:
+            Chunks of the response as they become available.
+
+        Raises:
+            ProviderError: If an error is not retryable, happens after the first
+                chunk, or persists across all attempts and providers.
+            LLMTimeoutError: If the deadline expired.
+        """
+        last_error = None
+        for provider, client, model in self._routes():
+            if last_error is not None:
+                logger.warning(f"{self.name or 'LLM'}: failing over from {last_error.provider} to {provider}")
+            for attempt in range(self.retry_policy.max_attempts):
+                if deadline is not None and deadline.expired():
+                    raise LLMTimeoutError(provider, "total", deadline.total)
+                emitted = False
+                stream = self._attempt(user_prompt, provider, client, model, deadline)
+                try:
+                    async for chunk in stream:
+                        emitted = True
+                        yield chunk
+                    return
+                except ProviderError as e:
+                    if emitted or not e.retryable:
+                        raise
+                    last_error = e
+                    logger.warning(
+                        f"{self.name or 'LLM'}: attempt {attempt + 1}/{self.retry_policy.max_attempts} "
+                        f"on {provider} failed: {e}"
+                    )
+                    if attempt + 1 < self.retry_policy.max_attempts:
+                        delay = self.retry_policy.delay(attempt)
+                        if deadline is not None and deadline.remaining() is not None:
+                            delay = min(delay, deadline.remaining())
+                        await asyncio.sleep(delay)
+                finally:
+                    await stream.aclose()
+        raise last_error
+
+    def _attempt(
+        self, user_prompt: Prompt, provider: str, client, model: str, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Start one attempt against a provider, hedged if a hedge policy is set.
+
+        Args:
+            user_prompt: The user prompt or message list.
+            provider: The provider to call.
+            client: The client for that provider.
+            model: The model to use.
+            deadline: Time limits of the call, applied to each request.
 
-    async def _call_openai(self, user_prompt: str) -> AsyncGenerator[str, None]:
+        Returns:
+            An AsyncGenerator yielding the response chunks.
+        """
+        if self.hedge_policy is None:
+            return self._call_provider(user_prompt, provider, client, model, deadline)
+
+        hedge_provider, hedge_client, hedge_model = provider, client, model
+        alternate = self.hedge_policy.alternate_provider
+        if alternate is not None and alternate != provider:
+            try:
+                hedge_provider, hedge_client, hedge_model = alternate, get_client(alternate), DEFAULT_MODELS[alternate]
+            except ValueError as e:
+                logger.warning(f"Cannot hedge on {alternate}, hedging on {provider} instead: {e}")
+
+        return hedged_stream(
+            lambda: self._call_provider(user_prompt, provider, client, model, deadline),
+            lambda: self._call_provider(user_prompt, hedge_provider, hedge_client, hedge_model, deadline),
+            self.hedge_policy.delay_for(provider, model),
+            get_hedge_stats(provider, model),
+        )
+
+    async def _call_provider(
+        self, user_prompt: Prompt, provider: str, client, model: str, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Dispatch a single call to a provider.
+
+        The call first waits for budget on the shared provider/model rate
+        limiter, reserving the estimated prompt tokens plus max_tokens. Its
+        timing and token usage are reported to the metrics sinks when the
+        stream ends, fails, times out or is abandoned.
+
+        Args:
+            user_prompt: The user prompt or message list.
+            provider: The provider to call.
+            client: The client for that provider.
+            model: The model to use.
+            deadline: Time limits of the call; the SDK gets the connect limit
+                and the stream is cut off when a chunk is late.
+
+        Yields:
+            Chunks of the response as they become available.
+        """
+        metrics = CallMetrics(provider=provider, model=model, persona=self.name, debate_id=self.debate_id)
+        limiter = get_rate_limiter(provider, model)
+        if limiter is not None:
+            acquire = limiter.acquire(
+                estimate_tokens(self.system_prompt + prompt_text(user_prompt)) + self.max_tokens
+            )
+            try:
+                metrics.queue_wait = await asyncio.wait_for(
+                    acquire, deadline.remaining() if deadline is not None else None
+                )
+            except asyncio.TimeoutError:
+                metrics.outcome = "timeout"
+                metrics.timeout_phase = "total"
+                emit(metrics)
+                raise LLMTimeoutError(provider, "total", deadline.total)
+
+        if provider == "openai":
+            call = self._call_openai(user_prompt, client, model, metrics, deadline)
+        elif provider == "mock":
+            call = self._call_mock(user_prompt, client, metrics)
+        else:
+            call = self._call_claude(user_prompt, client, model, metrics, deadline)
+        if deadline is not None:
+            call = enforce_deadline(call, deadline, provider)
+
+        metrics.started_at = time.time()
+        start = last = time.perf_counter()
+        total_gap = 0.0
+        try:
+            async for chunk in call:
+                now = time.perf_counter()
+                if metrics.chunks == 0:
+                    metrics.ttft = now - start
+                    ttft_tracker.observe(provider, model, metrics.ttft)
+                else:
+                    total_gap += now - last
+                    metrics.max_gap = max(metrics.max_gap, now - last)
+                metrics.chunks += 1
+                last = now
+                yield chunk
+        except LLMTimeoutError as e:
+            metrics.outcome = "timeout"
+            metrics.timeout_phase = e.phase
+            metrics.error = str(e)
+            raise
+        except ProviderError as e:
+            metrics.outcome = "error"
+            metrics.error = str(e)
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            metrics.outcome = "cancelled"
+            raise
+        finally:
+            await call.aclose()
+            metrics.duration = time.perf_counter() - start
+            if metrics.chunks > 1:
+                metrics.mean_gap = total_gap / (metrics.chunks - 1)
+            emit(metrics)
+
+    async def _call_openai(
+        self, user_prompt: Prompt, client, model: str, metrics: CallMetrics, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
         """
         Call the OpenAI API asynchronously.
 
+        OpenAI caches prompt prefixes automatically, so the system prompt and
+        conversation are sent first and unchanged; streamed calls request a
+        final usage chunk to learn how many input tokens were cached.
+
         Args:
-            user_prompt: The input prompt from the user.
+            user_prompt: The user prompt or message list.
+            client: The AsyncOpenAI client.
+            model: The model to use.
+            metrics: Receives the provider-reported token usage.
+            deadline: Provides the per-request connect and total timeouts.
 
         Yields:
             Chunks of the response as they become available.
+
+        Raises:
+            ProviderError: If the API call fails.
+            LLMTimeoutError: If connecting or the whole request timed out.
         """
-        messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+        messages = [{"role": "system", "content": self.system_prompt}] + as_messages(user_prompt)
+        extra = {"stream_options": {"include_usage": True}} if self.stream else {}
+        if deadline is not None:
+            extra["timeout"] = deadline.http_timeout()
 
+        response = None
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            response = await client.chat.completions.create(
+                model=model,
                 messages=messages,
                 stream=self.stream,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
+                **extra,
             )
 
             if self.stream:
                 async for chunk in response:
                     if chunk.choices and chunk.choices[0].delta.content is not None:
                         yield chunk.choices[0].delta.content
+                    if getattr(chunk, "usage", None):
+                        self._record_openai_usage(metrics, chunk.usage)
             else:
+                self._record_openai_usage(metrics, response.usage)
                 yield response.choices[0].message.content
-        except Exception as e:
-            yield f"Error calling OpenAI API: {str(e)}"
-
-    async def _call_claude(self, user_prompt: str) -> AsyncGenerator[str, None]:
+        except openai.APITimeoutError as e:
+            raise self._timeout_error("openai", e, deadline) from e
+        except openai.OpenAIError as e:
+            raise ProviderError.from_exception("openai", e) from e
+        finally:
+            # Release the connection even if the consumer stopped early
+            if self.stream and response is not None:
+                await response.close()
+
+    async def _call_claude(
+        self, user_prompt: Prompt, client, model: str, metrics: CallMetrics, deadline: Optional[Deadline] = None
+    ) -> AsyncGenerator[str, None]:
         """
         Call the Anthropic Claude API asynchronously.
 
+        Cache breakpoints are placed on the system prompt and on the message
+        before the final one, so the next turn of the same conversation reads
+        everything up to that point from the prompt cache.
+
         Args:
-            user_prompt: The input prompt from the user.
+            user_prompt: The user prompt or message list.
+            client: The AsyncAnthropic client.
+            model: The model to use.
+            metrics: Receives the provider-reported token usage.
+            deadline: Provides the per-request connect and total timeouts.
 
         Yields:
             Chunks of the response as they become available.
+
+        Raises:
+            ProviderError: If the API call fails.
+            LLMTimeoutError: If connecting or the whole request timed out.
         """
+        extra = {"timeout": deadline.http_timeout()} if deadline is not None else {}
+        response = None
         try:
-            response = await self.client.messages.create(
-                model=self.model,
+            response = await client.messages.create(
+                model=model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
-                system=self.system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ],
+                system=[{"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}}],
+                messages=self._claude_messages(as_messages(user_prompt)),
                 stream=self.stream,
+                **extra,
             )
 
             if self.stream:
+                usage = {}
                 async for chunk in response:
                     if chunk.type == 'content_block_delta' and chunk.delta.type == 'text_delta':
                         yield chunk.delta.text
+                    elif chunk.type == 'message_start':
+                        usage["input"] = chunk.message.usage
+                    elif chunk.type == 'message_delta':
+                        usage["output_tokens"] = chunk.usage.output_tokens
+                if "input" in usage:
+                    self._record_claude_usage(metrics, usage["input"], usage.get("output_tokens", 0))
             else:
+                self._record_claude_usage(metrics, response.usage, response.usage.output_tokens)
                 yield response.content[0].text
-        except Exception as e:
-            yield f"Error calling Claude API: {str(e)}"
+        except anthropic.APITimeoutError as e:
+            raise self._timeout_error("claude", e, deadline) from e
+        except anthropic.AnthropicError as e:
+            raise ProviderError.from_exception("claude", e) from e
+        finally:
+            # Release the connection even if the consumer stopped early
+            if self.stream and response is not None:
+                await response.close()
+
+    async def _call_mock(self, user_prompt: Prompt, client, metrics: CallMetrics) -> AsyncGenerator[str, None]:
+        """
+        Call the offline mock provider asynchronously.
+
+        Args:
+            user_prompt: The user prompt or message list.
+            client: The MockClient.
+            metrics: Receives the estimated token usage.
+
+        Yields:
+            Chunks of the synthetic response as they become available.
+
+        Raises:
+            ProviderError: If the mock simulates a failure.
+        """
+        text = prompt_text(user_prompt)
+        output_tokens = 0
+        try:
+            if self.stream:
+                async for chunk in client.stream(self.system_prompt, text, self.max_tokens):
+                    output_tokens += 1
+                    yield chunk
+            else:
+                completion = await client.complete(self.system_prompt, text, self.max_tokens)
+                output_tokens = len(completion.split())
+                yield completion
+        except MockProviderError as e:
+            raise ProviderError.from_exception("mock", e) from e
+        self._record_usage(metrics, estimate_tokens(self.system_prompt + text), 0, 0, output_tokens)
+
+    @staticmethod
+    def _claude_messages(messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Convert messages to Anthropic content blocks with a cache breakpoint.
+
+        The breakpoint goes on the message before the final one, which ends the
+        part of the conversation the next turn will repeat verbatim.
+        Consecutive messages with the same role are merged into one message
+        with several blocks, since the API requires alternating roles.
+
+        Args:
+            messages: The conversation as {"role", "content"} messages.
+
+        Returns:
+            The messages in Anthropic's block format.
+        """
+        converted = []
+        for i, message in enumerate(messages):
+            block = {"type": "text", "text": message["content"]}
+            if i == len(messages) - 2:
+                block["cache_control"] = {"type": "ephemeral"}
+            if converted and converted[-1]["role"] == message["role"]:
+                converted[-1]["content"].append(block)
+            else:
+                converted.append({"role": message["role"], "content": [block]})
+        return converted
+
+    @staticmethod
+    def _timeout_error(provider: str, error: Exception, deadline: Optional[Deadline]) -> ProviderError:
+        """
+        Translate an SDK timeout into the phase of the deadline that expired.
+
+        The SDK only enforces the connect limit and the remaining total time,
+        so a timeout is a connect timeout unless the total time has run out.
+        Without a deadline, the pool timeouts expired and the error is handled
+        like any other connection error.
+        """
+        if deadline is None:
+            return ProviderError.from_exception(provider, error)
+        if deadline.expired():
+            return LLMTimeoutError(provider, "total", deadline.total)
+        return LLMTimeoutError(provider, "connect", deadline.connect)
+
+    def _record_openai_usage(self, metrics: CallMetrics, usage) -> None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        self._record_usage(metrics, usage.prompt_tokens, cached, 0, usage.completion_tokens)
+
+    def _record_claude_usage(self, metrics: CallMetrics, usage, output_tokens: int) -> None:
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self._record_usage(
+            metrics, usage.input_tokens + cache_read + cache_write, cache_read, cache_write, output_tokens
+        )
+
+    def _record_usage(self, metrics: CallMetrics, input_tokens: int, cached_input_tokens: int,
+                      cache_write_tokens: int, output_tokens: int) -> None:
+        """
+        Store the token usage of a call in its metrics and in last_usage.
+
+        Args:
+            metrics: The metrics of the call.
+            input_tokens: All input tokens, cached or not.
+            cached_input_tokens: Input tokens read from the prompt cache.
+            cache_write_tokens: Input tokens written to the prompt cache.
+            output_tokens: Generated tokens.
+        """
+        metrics.prompt_tokens = input_tokens
+        metrics.cached_prompt_tokens = cached_input_tokens
+        metrics.completion_tokens = output_tokens
+        self.last_usage = {
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "uncached_input_tokens": input_tokens - cached_input_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "output_tokens": output_tokens,
+        }
+        logger.debug(f"{self.name or 'LLM'} usage: {self.last_usage}")
 
     async def _handle_stream(self, response) -> str:
         """
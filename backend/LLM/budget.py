@@ -0,0 +1,190 @@
+"""
+This module fits debate prompts into the context window of the model they are
+sent to. The system prompt, the fixed messages around the history and the
+output reservation (max_tokens) are always sent, so the history gets what is
+left; when it does not fit, its oldest turns are left out of the prompt.
+"""
+
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+from LLM.base import DEFAULT_MODELS, AsyncLLM
+from LLM.ConversationHandler import SUMMARY_PREFIX, ConversationHistory
+from LLM.tokens import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Context windows in tokens, input and output together
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "claude-3-5-sonnet-20240620": 200000,
+    "claude-3-opus-20240229": 200000,
+    "claude-3-haiku-20240307": 200000,
+    "mock-1": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens each chat message costs beyond its content (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+def context_window(model: str) -> int:
+    """
+    Return the context window of a model.
+
+    LLM_CONTEXT_WINDOW, when set, caps every model's window, e.g. to keep
+    prompts small and cheap.
+
+    Args:
+        model: The model name.
+
+    Returns:
+        The window in tokens; DEFAULT_CONTEXT_WINDOW for unknown models.
+    """
+    window = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    cap = os.getenv("LLM_CONTEXT_WINDOW")
+    return min(window, int(cap)) if cap else window
+
+
+def llm_context_window(llm: AsyncLLM) -> int:
+    """
+    Return the window an LLM's prompts must fit: the smallest of its primary
+    and fallback models, since a prompt may fail over.
+    """
+    window = context_window(llm.model)
+    if llm.fallback_provider is not None:
+        window = min(window, context_window(DEFAULT_MODELS[llm.fallback_provider]))
+    return window
+
+
+def input_budget(llm: AsyncLLM) -> int:
+    """
+    Return the input tokens an LLM's prompts may use, system prompt included:
+    its window minus the max_tokens reserved for the output, and 0 when the
+    reservation alone fills the window.
+    """
+    window = llm_context_window(llm)
+    if llm.max_tokens >= window:
+        logger.warning(
+            f"{llm.name or 'LLM'}: max_tokens={llm.max_tokens} leaves no room for the prompt "
+            f"in the {window}-token context window; lower max_tokens or use models with larger windows"
+        )
+        return 0
+    return window - llm.max_tokens
+
+
+@dataclass
+class PromptBudget:
+    """
+    Token breakdown of one prompt.
+
+    Attributes:
+        model: The model the prompt is sized for.
+        context_window: Window of the model (the smallest one with failover).
+        output_reserve: Tokens reserved for the answer (max_tokens).
+        system_tokens: Tokens of the system prompt.
+        fixed_tokens: Tokens of the messages around the history.
+        history_tokens: Tokens of the history messages included.
+        history_messages: Number of history messages included.
+        dropped_messages: Number of history messages left out to fit.
+        exact: Whether the counts come from the model's tokenizer rather
+            than estimates.
+    """
+
+    model: str
+    context_window: int
+    output_reserve: int
+    system_tokens: int
+    fixed_tokens: int
+    history_tokens: int
+    history_messages: int
+    dropped_messages: int
+    exact: bool
+
+    @property
+    def input_tokens(self) -> int:
+        return self.system_tokens + self.fixed_tokens + self.history_tokens
+
+    @property
+    def free_tokens(self) -> int:
+        return self.context_window - self.output_reserve - self.input_tokens
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Return the breakdown, including input_tokens and free_tokens.
+        """
+        data = asdict(self)
+        data["input_tokens"] = self.input_tokens
+        data["free_tokens"] = self.free_tokens
+        return data
+
+
+def fit_prompt(
+    llm: AsyncLLM,
+    history: ConversationHistory,
+    head: List[Dict[str, str]],
+    tail: List[Dict[str, str]],
+) -> Tuple[List[Dict[str, str]], PromptBudget]:
+    """
+    Assemble head + history + tail, leaving out history that does not fit.
+
+    History messages use the token counts cached when they were added, plus
+    the prefix put before each summary when they are rendered. When
+    over budget, the oldest turns are dropped first, then the oldest
+    summaries; the latest message is always kept.
+
+    Args:
+        llm: The LLM the prompt is for, with its system prompt and max_tokens.
+        history: The conversation history.
+        head: Messages before the history.
+        tail: Messages after the history.
+
+    Returns:
+        The prompt messages and their token breakdown.
+    """
+    counter = get_token_counter(llm.provider, llm.model)
+    window = llm_context_window(llm)
+    system_tokens = counter.count(llm.system_prompt or "")
+    fixed_tokens = sum(counter.count(message["content"]) + MESSAGE_OVERHEAD for message in head + tail)
+
+    rendered = history.get_messages(llm.name)
+    summary_prefix_tokens = counter.count(SUMMARY_PREFIX)
+    history_tokens = (
+        history.total_tokens
+        + MESSAGE_OVERHEAD * len(rendered)
+        + summary_prefix_tokens * history.summary_count
+    )
+    available = input_budget(llm) - system_tokens - fixed_tokens
+
+    kept = rendered
+    if history_tokens > available and rendered:
+        summaries = history.summary_count
+        dropped = set()
+        # Turns oldest first, then summaries oldest first; never the latest message
+        for index in list(range(summaries, len(rendered) - 1)) + list(range(min(summaries, len(rendered) - 1))):
+            if history_tokens <= available:
+                break
+            dropped.add(index)
+            history_tokens -= history.messages[index].token_count + MESSAGE_OVERHEAD
+            if index < summaries:
+                history_tokens -= summary_prefix_tokens
+        kept = [message for index, message in enumerate(rendered) if index not in dropped]
+
+    budget = PromptBudget(
+        model=llm.model,
+        context_window=window,
+        output_reserve=llm.max_tokens,
+        system_tokens=system_tokens,
+        fixed_tokens=fixed_tokens,
+        history_tokens=history_tokens,
+        history_messages=len(kept),
+        dropped_messages=len(rendered) - len(kept),
+        exact=counter.exact,
+    )
+    return head + kept + tail, budget
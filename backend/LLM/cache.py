@@ -0,0 +1,190 @@
+"""
+This module provides a content-addressed completion cache for AsyncLLM, with an
+in-memory LRU tier in front of an optional bounded on-disk tier.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Optional, Tuple
+
+
+class CompletionCache:
+    """
+    Caches full completions by request key.
+
+    Entries expire after a TTL. The memory tier keeps the most recently used
+    entries; the disk tier holds one JSON file per entry and deletes the oldest
+    files once it grows past its size limit.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 50 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Initialize the CompletionCache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory.
+            directory: Directory of the disk tier; memory only when None.
+            max_disk_bytes: Size limit of the disk tier.
+            ttl: Seconds an entry stays valid; never expires when None.
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "CompletionCache":
+        """
+        Build a cache from LLM_CACHE_* environment variables.
+
+        Returns:
+            A CompletionCache with defaults for any variable that is not set.
+        """
+        ttl = os.getenv("LLM_CACHE_TTL")
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512)),
+            directory=os.getenv("LLM_CACHE_DIR") or None,
+            max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_DISK_BYTES", 50 * 1024 * 1024)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a completion.
+
+        Args:
+            key: The request key, as produced by AsyncLLM.request_key().
+
+        Returns:
+            The cached completion, or None on a miss.
+        """
+        entry = self._memory.get(key)
+        if entry is not None and not self._expired(entry[0]):
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry[1]
+        self._memory.pop(key, None)
+
+        if self.directory is not None:
+            entry = await asyncio.to_thread(self._read, key)
+            if entry is not None and not self._expired(entry[0]):
+                self._remember(key, entry)
+                self.disk_hits += 1
+                return entry[1]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, completion: str) -> None:
+        """
+        Store a completion in both tiers.
+
+        Args:
+            key: The request key.
+            completion: The full completion text.
+        """
+        entry = (time.time(), completion)
+        self._remember(key, entry)
+        if self.directory is not None:
+            await asyncio.to_thread(self._write, key, entry)
+
+    async def replay(self, completion: str) -> AsyncGenerator[str, None]:
+        """
+        Stream a cached completion word by word, so streaming clients still
+        receive incremental chunks.
+
+        Args:
+            completion: The cached completion text.
+
+        Yields:
+            Chunks of the completion.
+        """
+        for chunk in re.findall(r"\S+\s*|\s+", completion):
+            yield chunk
+            await asyncio.sleep(0)
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current memory size.
+        """
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Tuple[float, str]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                payload = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return payload["created"], payload["completion"]
+
+    def _write(self, key: str, entry: Tuple[float, str]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": entry[0], "completion": entry[1]}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_default_cache: Optional[CompletionCache] = None
+
+
+def get_default_cache() -> CompletionCache:
+    """
+    Return the process-wide cache configured through the environment.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CompletionCache.from_env()
+    return _default_cache
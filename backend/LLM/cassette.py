@@ -0,0 +1,151 @@
+"""
+This module records provider response streams (chunk text plus inter-chunk
+timing) to compact cassette files and replays them later, giving reproducible
+latency profiles without network access.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, List, Literal, Optional, Tuple
+
+from LLM.errors import LLMError
+
+CASSETTE_VERSION = 1
+
+
+class CassetteNotFoundError(LLMError, LookupError):
+    """
+    Raised when replaying a request that has no recorded cassette. It is an
+    LLMError so the routes report it like a failed provider call; replays
+    are never retried.
+    """
+
+
+@dataclass
+class Cassette:
+    """
+    Records or replays AsyncLLM response streams.
+
+    Each request is stored as one gzipped JSON file named after the request key,
+    holding the chunks and the delay (in milliseconds) that preceded each one.
+
+    Attributes:
+        mode: "record" to capture live streams, "replay" to serve stored ones.
+        directory: Directory holding the cassette files.
+        speed: Replay speed factor; 1.0 keeps the original timing, 2.0 plays
+            twice as fast and 0 replays without any delay.
+    """
+
+    mode: Literal["record", "replay"]
+    directory: str = "cassettes"
+    speed: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """
+        Build a cassette from LLM_CASSETTE_* environment variables.
+
+        Returns:
+            A Cassette, or None if LLM_CASSETTE_MODE is not set.
+        """
+        mode = os.getenv("LLM_CASSETTE_MODE")
+        if not mode:
+            return None
+        if mode not in ("record", "replay"):
+            raise ValueError("LLM_CASSETTE_MODE must be 'record' or 'replay'.")
+        return cls(
+            mode=mode,
+            directory=os.getenv("LLM_CASSETTE_DIR", "cassettes"),
+            speed=float(os.getenv("LLM_CASSETTE_SPEED", "1.0")),
+        )
+
+    def path(self, key: str) -> str:
+        """
+        Return the file path of the cassette for a request key.
+
+        Args:
+            key: The request key, as produced by AsyncLLM.request_key().
+        """
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    async def record(
+        self,
+        key: str,
+        stream: AsyncGenerator[str, None],
+        metadata: Optional[dict] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Pass a provider stream through while recording it.
+
+        The cassette is only written once the stream completes, so failed or
+        abandoned calls never leave partial recordings behind.
+
+        Args:
+            key: The request key.
+            stream: The live provider stream.
+            metadata: Extra fields (provider, model, ...) stored alongside.
+
+        Yields:
+            The chunks of the live stream, unchanged.
+        """
+        chunks: List[Tuple[int, str]] = []
+        last = time.perf_counter()
+        try:
+            async for chunk in stream:
+                now = time.perf_counter()
+                chunks.append((round((now - last) * 1000), chunk))
+                last = now
+                yield chunk
+        finally:
+            await stream.aclose()
+
+        await asyncio.to_thread(self._write, key, chunks, metadata or {})
+
+    async def replay(self, key: str) -> AsyncGenerator[str, None]:
+        """
+        Replay a recorded stream with its original timing scaled by speed.
+
+        Args:
+            key: The request key.
+
+        Yields:
+            The recorded chunks.
+
+        Raises:
+            CassetteNotFoundError: If nothing was recorded for this key.
+        """
+        chunks = await asyncio.to_thread(self._read, key)
+        for delay_ms, chunk in chunks:
+            if self.speed > 0 and delay_ms > 0:
+                await asyncio.sleep(delay_ms / 1000 / self.speed)
+            yield chunk
+
+    def _write(self, key: str, chunks: List[Tuple[int, str]], metadata: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        payload = {"version": CASSETTE_VERSION, **metadata, "chunks": chunks}
+        tmp_path = self.path(key) + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path(key))
+
+    def _read(self, key: str) -> List[Tuple[int, str]]:
+        try:
+            with gzip.open(self.path(key), "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            raise CassetteNotFoundError(f"No cassette recorded for request {key}")
+        return payload["chunks"]
+
+
+_default_cassette: Optional[Cassette] = Cassette.from_env()
+
+
+def get_default_cassette() -> Optional[Cassette]:
+    """
+    Return the cassette configured through the environment, if any.
+    """
+    return _default_cassette
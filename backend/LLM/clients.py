@@ -0,0 +1,167 @@
+"""
+This module keeps a process-wide registry of provider clients so that every
+AsyncLLM instance shares the same keep-alive connection pool instead of opening
+its own HTTP client.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+from LLM.mock import MockClient, MockConfig
+
+load_dotenv()
+
+API_KEY_ENV_VARS = {
+    "openai": "OPENAI_API_KEY",
+    "claude": "ANTHROPIC_API_KEY",
+}
+
+
+@dataclass
+class PoolConfig:
+    """
+    Connection pool settings applied to every shared provider client.
+
+    Attributes:
+        max_connections: Maximum number of concurrent connections per client.
+        max_keepalive_connections: Maximum number of idle connections kept open.
+        keepalive_expiry: Seconds an idle connection is kept before closing.
+        connect_timeout: Seconds allowed to establish a new connection.
+        read_timeout: Seconds allowed between bytes received from the provider.
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 600.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        """
+        Build a pool configuration from LLM_POOL_* environment variables.
+
+        Returns:
+            A PoolConfig with defaults for any variable that is not set.
+        """
+        defaults = cls()
+        return cls(
+            max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", defaults.max_connections)),
+            max_keepalive_connections=int(
+                os.getenv("LLM_POOL_MAX_KEEPALIVE", defaults.max_keepalive_connections)
+            ),
+            keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", defaults.keepalive_expiry)),
+            connect_timeout=float(os.getenv("LLM_POOL_CONNECT_TIMEOUT", defaults.connect_timeout)),
+            read_timeout=float(os.getenv("LLM_POOL_READ_TIMEOUT", defaults.read_timeout)),
+        )
+
+    def build_http_client(self) -> httpx.AsyncClient:
+        """
+        Create an httpx client using this pool configuration.
+
+        Returns:
+            A new httpx.AsyncClient with keep-alive limits and timeouts applied.
+        """
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+        )
+
+
+_pool_config: PoolConfig = PoolConfig.from_env()
+_clients: Dict[Tuple[str, str], Any] = {}
+
+
+def configure_pool(config: PoolConfig) -> None:
+    """
+    Replace the pool configuration used for clients created from now on.
+
+    Clients that already exist keep their pool until close_clients() is called.
+
+    Args:
+        config: The new pool configuration.
+    """
+    global _pool_config
+    _pool_config = config
+
+
+def get_api_key(provider: str) -> str:
+    """
+    Look up the API key for a provider in the environment.
+
+    Args:
+        provider: The LLM provider ("openai" or "claude").
+
+    Returns:
+        The API key.
+
+    Raises:
+        ValueError: If the provider is invalid or API key is missing.
+    """
+    env_var = API_KEY_ENV_VARS.get(provider)
+    if env_var is None:
+        raise ValueError("Invalid provider. Choose 'openai', 'claude' or 'mock'.")
+    api_key = os.getenv(env_var)
+    if not api_key:
+        raise ValueError(f"{env_var} not found in environment variables")
+    return api_key
+
+
+def get_client(provider: str, api_key: Optional[str] = None) -> Any:
+    """
+    Return the shared client for a provider, creating it on first use.
+
+    Clients are keyed by provider and credentials, so instances using the same
+    API key reuse one connection pool. The "mock" provider needs no key and is
+    configured from MOCK_LLM_* environment variables.
+
+    Args:
+        provider: The LLM provider ("openai", "claude" or "mock").
+        api_key: Explicit API key; read from the environment when omitted.
+
+    Returns:
+        An AsyncOpenAI, AsyncAnthropic or MockClient instance.
+
+    Raises:
+        ValueError: If the provider is invalid or API key is missing.
+    """
+    if provider == "mock":
+        client = _clients.get(("mock", ""))
+        if client is None:
+            client = _clients[("mock", "")] = MockClient(MockConfig.from_env())
+        return client
+
+    api_key = api_key or get_api_key(provider)
+    key = (provider, api_key)
+    client = _clients.get(key)
+    if client is None:
+        http_client = _pool_config.build_http_client()
+        if provider == "openai":
+            client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+        else:
+            client = AsyncAnthropic(api_key=api_key, http_client=http_client)
+        _clients[key] = client
+    return client
+
+
+async def close_clients() -> None:
+    """
+    Close every shared client and its connection pool.
+
+    Meant to be called once on application shutdown; clients requested
+    afterwards are created fresh.
+    """
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
@@ -0,0 +1,142 @@
+"""
+This module defines per-request deadlines for LLM calls and the helpers that
+enforce them on response streams.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Optional, Tuple
+
+import httpx
+
+from LLM.errors import LLMTimeoutError
+
+PHASES = ("connect", "first_token", "idle", "total")
+
+
+@dataclass
+class Deadline:
+    """
+    Time limits of one request, measured from the moment it is created.
+
+    A limit of None disables that phase. The total limit is absolute: it covers
+    rate-limit queueing, retries and failover of the same request.
+
+    Attributes:
+        connect: Seconds allowed to open a connection to the provider.
+        first_token: Seconds allowed between sending a call and its first chunk.
+        idle: Seconds allowed between two chunks.
+        total: Seconds allowed for the whole request.
+        expires_at: Monotonic time at which the total limit runs out.
+    """
+
+    connect: Optional[float] = 10.0
+    first_token: Optional[float] = 60.0
+    idle: Optional[float] = 30.0
+    total: Optional[float] = 180.0
+    expires_at: Optional[float] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.expires_at is None and self.total is not None:
+            self.expires_at = time.monotonic() + self.total
+
+    @classmethod
+    def from_env(cls, prefix: str = "LLM") -> "Deadline":
+        """
+        Build a deadline starting now from <PREFIX>_TIMEOUT_* environment variables.
+
+        Endpoint prefixes (e.g. ONE_TURN or WS) fall back to the LLM_TIMEOUT_*
+        variables, then to the defaults. A value of 0 disables the phase.
+
+        Args:
+            prefix: The variable prefix of the endpoint.
+
+        Returns:
+            A new Deadline.
+        """
+        defaults = cls()
+        limits = {}
+        for phase in PHASES:
+            value = os.getenv(f"{prefix}_TIMEOUT_{phase.upper()}") or os.getenv(f"LLM_TIMEOUT_{phase.upper()}")
+            limit = getattr(defaults, phase) if not value else float(value)
+            limits[phase] = limit if limit else None
+        return cls(**limits)
+
+    def remaining(self) -> Optional[float]:
+        """
+        Return the seconds left before the total limit, or None if unlimited.
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """
+        Return whether the total limit has run out.
+        """
+        return self.remaining() == 0.0
+
+    def timeout_for(self, phase: str) -> Tuple[Optional[float], str]:
+        """
+        Return how long the next wait of a phase may take, and which limit applies.
+
+        Args:
+            phase: "connect", "first_token" or "idle".
+
+        Returns:
+            The timeout in seconds (None if unlimited) and the phase that would
+            expire first, which is "total" when less than the phase limit is left.
+        """
+        limit = getattr(self, phase)
+        remaining = self.remaining()
+        if remaining is not None and (limit is None or remaining < limit):
+            return remaining, "total"
+        return limit, phase
+
+    def http_timeout(self) -> httpx.Timeout:
+        """
+        Return the per-request timeout to pass to the provider SDKs.
+
+        Reads are only bounded by the remaining total time here; first-token
+        and idle limits are enforced on the stream by enforce_deadline().
+        """
+        connect, _ = self.timeout_for("connect")
+        return httpx.Timeout(self.remaining(), connect=connect)
+
+
+async def enforce_deadline(
+    stream: AsyncGenerator[str, None],
+    deadline: Deadline,
+    provider: str,
+) -> AsyncGenerator[str, None]:
+    """
+    Pass a provider stream through, failing if a chunk takes too long.
+
+    Args:
+        stream: The provider stream.
+        deadline: The deadline of the request.
+        provider: The provider being called, used in the error.
+
+    Yields:
+        The chunks of the stream, unchanged.
+
+    Raises:
+        LLMTimeoutError: If the first chunk, a later chunk or the whole request
+            exceeds its limit. The stream is closed before raising.
+    """
+    phase = "first_token"
+    try:
+        while True:
+            timeout, expiring = deadline.timeout_for(phase)
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(provider, expiring, getattr(deadline, expiring))
+            phase = "idle"
+            yield chunk
+    finally:
+        await stream.aclose()
@@ -0,0 +1,86 @@
+"""
+This module defines the exceptions raised by AsyncLLM, so callers can tell a
+failed provider call apart from response text.
+"""
+
+from typing import Optional
+
+import anthropic
+import openai
+
+from LLM.mock import MockProviderError
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class LLMError(Exception):
+    """Base class for errors raised while calling an LLM."""
+
+
+class ProviderError(LLMError):
+    """
+    A provider call failed.
+
+    Attributes:
+        provider: The provider that failed.
+        retryable: Whether retrying the same request may succeed.
+        status_code: The HTTP status returned by the provider, if any.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        message: str,
+        retryable: bool = False,
+        status_code: Optional[int] = None,
+    ):
+        super().__init__(f"Error calling {provider} API: {message}")
+        self.provider = provider
+        self.retryable = retryable
+        self.status_code = status_code
+
+    @classmethod
+    def from_exception(cls, provider: str, error: Exception) -> "ProviderError":
+        """
+        Translate an SDK exception into a ProviderError.
+
+        Connection failures, timeouts, 408/409/429 and 5xx responses are
+        considered transient; everything else (bad request, auth, ...) is not.
+
+        Args:
+            provider: The provider that raised the exception.
+            error: The exception raised by the SDK or the mock client.
+
+        Returns:
+            The corresponding ProviderError.
+        """
+        status_code = getattr(error, "status_code", None)
+        if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError, MockProviderError)):
+            retryable = True
+        elif status_code is not None:
+            retryable = status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+        else:
+            retryable = False
+        return cls(provider, str(error), retryable=retryable, status_code=status_code)
+
+
+class LLMTimeoutError(ProviderError):
+    """
+    A provider call exceeded one of the limits of its Deadline.
+
+    Timeouts before the first chunk are retryable as long as time is left;
+    running out of total time is not.
+
+    Attributes:
+        phase: The limit that expired: "connect", "first_token", "idle" or "total".
+        timeout: The limit in seconds.
+    """
+
+    def __init__(self, provider: str, phase: str, timeout: Optional[float]):
+        super().__init__(
+            provider,
+            f"{phase} timeout after {timeout:g}s" if timeout is not None else f"{phase} timeout",
+            retryable=phase in ("connect", "first_token"),
+        )
+        self.phase = phase
+        self.timeout = timeout
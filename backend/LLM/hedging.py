@@ -0,0 +1,227 @@
+"""
+This module implements hedged LLM requests: when the first chunk of a call is
+slow to arrive, a second identical request is fired and whichever stream
+produces a chunk first is kept while the other is cancelled.
+"""
+
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncGenerator, Callable, Deque, Dict, Optional, Tuple
+
+
+@dataclass
+class HedgePolicy:
+    """
+    When and where to send a hedge request.
+
+    Attributes:
+        delay: Fixed seconds to wait for the first chunk before hedging. When
+            None, the delay is learned from observed time-to-first-token.
+        percentile: TTFT percentile used as the learned delay.
+        min_samples: Observations needed before the learned delay is used.
+        initial_delay: Delay used until enough observations exist.
+        min_delay: Lower bound for the learned delay.
+        max_delay: Upper bound for the learned delay.
+        alternate_provider: Provider for the hedge request; the primary
+            provider is reused when None.
+    """
+
+    delay: Optional[float] = None
+    percentile: float = 0.95
+    min_samples: int = 20
+    initial_delay: float = 2.0
+    min_delay: float = 0.1
+    max_delay: float = 10.0
+    alternate_provider: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["HedgePolicy"]:
+        """
+        Build a hedge policy from LLM_HEDGE_* environment variables.
+
+        Returns:
+            A HedgePolicy, or None unless LLM_HEDGE_ENABLED is set to 1/true.
+        """
+        if os.getenv("LLM_HEDGE_ENABLED", "").lower() not in ("1", "true", "yes"):
+            return None
+        delay = os.getenv("LLM_HEDGE_DELAY")
+        return cls(
+            delay=float(delay) if delay else None,
+            percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", cls.percentile)),
+            alternate_provider=os.getenv("LLM_HEDGE_PROVIDER") or None,
+        )
+
+    def delay_for(self, provider: str, model: str) -> float:
+        """
+        Return the hedge delay for a provider/model.
+
+        Args:
+            provider: The provider of the primary request.
+            model: The model of the primary request.
+
+        Returns:
+            Seconds to wait for the first chunk before hedging.
+        """
+        if self.delay is not None:
+            return self.delay
+        learned = ttft_tracker.quantile(provider, model, self.percentile, self.min_samples)
+        if learned is None:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, learned))
+
+
+class TTFTTracker:
+    """
+    Keeps a sliding window of time-to-first-token observations per provider/model.
+    """
+
+    def __init__(self, window: int = 500):
+        """
+        Initialize the TTFTTracker.
+
+        Args:
+            window: Number of most recent observations kept per provider/model.
+        """
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def observe(self, provider: str, model: str, ttft: float) -> None:
+        """
+        Record a time-to-first-token observation in seconds.
+        """
+        key = (provider, model)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(ttft)
+
+    def quantile(self, provider: str, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Return the q-quantile of the observations, or None if there are too few.
+        """
+        samples = self._samples.get((provider, model))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class HedgeStats:
+    """
+    Counters describing how hedging behaves for one provider/model.
+
+    Attributes:
+        calls: Hedged calls started.
+        fired: Calls where the hedge request was sent.
+        hedge_won: Calls where the hedge produced the first chunk.
+        primary_won: Calls where the primary still won after the hedge fired.
+    """
+
+    calls: int = 0
+    fired: int = 0
+    hedge_won: int = 0
+    primary_won: int = 0
+
+
+ttft_tracker = TTFTTracker()
+_stats: Dict[Tuple[str, str], HedgeStats] = {}
+
+
+def get_hedge_stats(provider: str, model: str) -> HedgeStats:
+    """
+    Return the counters for a provider/model, creating them on first use.
+    """
+    return _stats.setdefault((provider, model), HedgeStats())
+
+
+def hedge_stats() -> Dict[str, dict]:
+    """
+    Return all hedging counters, keyed by "provider/model".
+    """
+    return {f"{provider}/{model}": vars(stats).copy() for (provider, model), stats in _stats.items()}
+
+
+async def _first_chunk(stream: AsyncGenerator[str, None]) -> Tuple[bool, Optional[str]]:
+    try:
+        return True, await stream.__anext__()
+    except StopAsyncIteration:
+        return False, None
+
+
+async def _discard(task: asyncio.Task, stream: AsyncGenerator[str, None]) -> None:
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await stream.aclose()
+
+
+async def hedged_stream(
+    start_primary: Callable[[], AsyncGenerator[str, None]],
+    start_hedge: Callable[[], AsyncGenerator[str, None]],
+    delay: float,
+    stats: HedgeStats,
+) -> AsyncGenerator[str, None]:
+    """
+    Stream from the primary request, hedging it if its first chunk is late.
+
+    Args:
+        start_primary: Creates the primary stream.
+        start_hedge: Creates the hedge stream; only called if the hedge fires.
+        delay: Seconds to wait for the primary's first chunk before hedging.
+        stats: Counters updated with the outcome.
+
+    Yields:
+        The chunks of whichever stream produced its first chunk first.
+
+    Raises:
+        Exception: The first error raised if every request fails before
+            producing a chunk.
+    """
+    stats.calls += 1
+    contenders: Dict[asyncio.Task, AsyncGenerator[str, None]] = {}
+    primary = start_primary()
+    primary_task = asyncio.ensure_future(_first_chunk(primary))
+    contenders[primary_task] = primary
+    winner = winner_task = None
+    hedged = False
+    errors = []
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if not done:
+            hedged = True
+            stats.fired += 1
+            hedge = start_hedge()
+            contenders[asyncio.ensure_future(_first_chunk(hedge))] = hedge
+
+        while contenders and winner is None:
+            done, _ = await asyncio.wait(contenders.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stream = contenders.pop(task)
+                if winner is None and task.exception() is None:
+                    winner, winner_task = stream, task
+                    continue
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                await stream.aclose()
+    finally:
+        for task, stream in contenders.items():
+            await _discard(task, stream)
+
+    if winner is None:
+        raise errors[0]
+    if hedged:
+        if winner is primary:
+            stats.primary_won += 1
+        else:
+            stats.hedge_won += 1
+
+    try:
+        has_chunk, chunk = winner_task.result()
+        if not has_chunk:
+            return
+        yield chunk
+        async for chunk in winner:
+            yield chunk
+    finally:
+        await winner.aclose()
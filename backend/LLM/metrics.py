@@ -0,0 +1,193 @@
+"""
+This module collects per-call LLM latency and usage metrics (time-to-first-token,
+inter-chunk gaps, duration, token usage) and hands them to pluggable sinks.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CallMetrics:
+    """
+    Measurements of a single provider request.
+
+    Attributes:
+        provider: The provider called.
+        model: The model used.
+        persona: Name of the calling AsyncLLM, usually the persona.
+        debate_id: The debate the call belongs to, if any.
+        started_at: Wall-clock time the request was sent (epoch seconds).
+        queue_wait: Seconds spent waiting on the rate limiter beforehand.
+        ttft: Seconds from sending the request to the first chunk.
+        duration: Seconds from sending the request to the end of the stream.
+        chunks: Number of chunks received.
+        max_gap: Longest pause between two chunks, in seconds.
+        mean_gap: Average pause between chunks, in seconds.
+        prompt_tokens: Provider-reported input tokens.
+        cached_prompt_tokens: Input tokens served from the prompt cache.
+        completion_tokens: Provider-reported output tokens.
+        outcome: "ok", "error", "timeout" or "cancelled".
+        error: The error message when outcome is "error" or "timeout".
+        timeout_phase: The deadline phase that expired when outcome is "timeout".
+    """
+
+    provider: str
+    model: str
+    persona: Optional[str] = None
+    debate_id: Optional[int] = None
+    started_at: float = field(default_factory=time.time)
+    queue_wait: float = 0.0
+    ttft: Optional[float] = None
+    duration: Optional[float] = None
+    chunks: int = 0
+    max_gap: float = 0.0
+    mean_gap: float = 0.0
+    prompt_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    outcome: str = "ok"
+    error: Optional[str] = None
+    timeout_phase: Optional[str] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """
+        Output tokens per second after the first token, if measurable.
+        """
+        if not self.completion_tokens or self.ttft is None or self.duration is None:
+            return None
+        generation_time = self.duration - self.ttft
+        return self.completion_tokens / generation_time if generation_time > 0 else None
+
+
+class MetricsSink:
+    """
+    Receives the metrics of every finished provider request.
+    """
+
+    def record(self, metrics: CallMetrics) -> None:
+        """
+        Handle the metrics of one request. Must not block the event loop.
+        """
+        raise NotImplementedError
+
+
+class LoggingSink(MetricsSink):
+    """
+    Logs one line per request.
+    """
+
+    def record(self, metrics: CallMetrics) -> None:
+        logger.info(
+            f"llm_call provider={metrics.provider} model={metrics.model} persona={metrics.persona} "
+            f"debate_id={metrics.debate_id} outcome={metrics.outcome} timeout_phase={metrics.timeout_phase} queue_wait={metrics.queue_wait:.3f} "
+            f"ttft={metrics.ttft} duration={metrics.duration} chunks={metrics.chunks} "
+            f"prompt_tokens={metrics.prompt_tokens} cached_prompt_tokens={metrics.cached_prompt_tokens} "
+            f"completion_tokens={metrics.completion_tokens}"
+        )
+
+
+class InMemorySink(MetricsSink):
+    """
+    Keeps the most recent requests and summarizes them per provider/model.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Initialize the InMemorySink.
+
+        Args:
+            capacity: Number of most recent requests kept.
+        """
+        self.calls: Deque[CallMetrics] = deque(maxlen=capacity)
+
+    def record(self, metrics: CallMetrics) -> None:
+        self.calls.append(metrics)
+
+    def recent(self, limit: int = 50) -> List[dict]:
+        """
+        Return the most recent requests, newest first.
+        """
+        return [asdict(metrics) for metrics in list(self.calls)[-limit:][::-1]]
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Return call counts, latency percentiles and token totals per provider/model.
+        """
+        groups: Dict[str, List[CallMetrics]] = {}
+        for metrics in self.calls:
+            groups.setdefault(f"{metrics.provider}/{metrics.model}", []).append(metrics)
+
+        summary = {}
+        for key, calls in groups.items():
+            ttfts = sorted(m.ttft for m in calls if m.ttft is not None)
+            durations = sorted(m.duration for m in calls if m.outcome == "ok" and m.duration is not None)
+            rates = [m.tokens_per_second for m in calls if m.tokens_per_second]
+            summary[key] = {
+                "calls": len(calls),
+                "errors": sum(m.outcome == "error" for m in calls),
+                "cancelled": sum(m.outcome == "cancelled" for m in calls),
+                "timeouts": _count(m.timeout_phase for m in calls if m.outcome == "timeout"),
+                "ttft_p50": _percentile(ttfts, 0.5),
+                "ttft_p95": _percentile(ttfts, 0.95),
+                "duration_p50": _percentile(durations, 0.5),
+                "duration_p95": _percentile(durations, 0.95),
+                "tokens_per_second": sum(rates) / len(rates) if rates else None,
+                "prompt_tokens": sum(m.prompt_tokens or 0 for m in calls),
+                "cached_prompt_tokens": sum(m.cached_prompt_tokens or 0 for m in calls),
+                "completion_tokens": sum(m.completion_tokens or 0 for m in calls),
+            }
+        return summary
+
+
+def _count(values) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+memory_sink = InMemorySink()
+_sinks: List[MetricsSink] = [memory_sink]
+if os.getenv("LLM_METRICS_LOG", "").lower() in ("1", "true", "yes"):
+    _sinks.append(LoggingSink())
+
+
+def add_sink(sink: MetricsSink) -> None:
+    """
+    Register a sink to receive the metrics of every request.
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink: MetricsSink) -> None:
+    """
+    Unregister a previously added sink.
+    """
+    _sinks.remove(sink)
+
+
+def emit(metrics: CallMetrics) -> None:
+    """
+    Hand the metrics of a finished request to every registered sink.
+
+    A failing sink is logged and skipped so it can never break an LLM call.
+    """
+    for sink in list(_sinks):
+        try:
+            sink.record(metrics)
+        except Exception:
+            logger.exception(f"Metrics sink {type(sink).__name__} failed")
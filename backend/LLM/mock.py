@@ -0,0 +1,185 @@
+"""
+This module provides an offline "mock" LLM provider that streams deterministic
+synthetic tokens, so the debate backend can be load-tested without network
+access or API keys.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import AsyncGenerator, List
+
+WORDS = [
+    "indeed", "frankly", "the", "audience", "knows", "that", "my", "opponent",
+    "argument", "collapses", "like", "a", "soggy", "waffle", "under", "scrutiny",
+    "evidence", "clearly", "shows", "nobody", "asked", "for", "this", "nonsense",
+    "and", "yet", "here", "we", "are", "debating", "it", "with", "gusto",
+    "history", "will", "remember", "who", "was", "right", "today", "folks",
+]
+
+
+class MockProviderError(Exception):
+    """Raised by the mock provider to simulate a failed API call."""
+
+
+@dataclass
+class MockConfig:
+    """
+    Latency and output settings for the mock provider.
+
+    Attributes:
+        ttft: Seconds before the first token is emitted.
+        tokens_per_second: Token emission rate after the first token.
+        jitter: Relative random variation applied to every delay (0.0 to 1.0).
+        error_rate: Probability that a call fails before emitting anything.
+        response_tokens: Number of tokens in a regular (non-persona) response.
+        persona_tokens: Extra filler tokens in every generated persona system
+            prompt, to mimic the length of real ones.
+        seed: Seed for the per-prompt generators and the failure sequence.
+    """
+
+    ttft: float = 0.3
+    tokens_per_second: float = 50.0
+    jitter: float = 0.1
+    error_rate: float = 0.0
+    response_tokens: int = 120
+    persona_tokens: int = 0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        """
+        Build a mock configuration from MOCK_LLM_* environment variables.
+
+        Returns:
+            A MockConfig with defaults for any variable that is not set.
+        """
+        defaults = cls()
+        return cls(
+            ttft=float(os.getenv("MOCK_LLM_TTFT", defaults.ttft)),
+            tokens_per_second=float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", defaults.tokens_per_second)),
+            jitter=float(os.getenv("MOCK_LLM_JITTER", defaults.jitter)),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", defaults.error_rate)),
+            response_tokens=int(os.getenv("MOCK_LLM_RESPONSE_TOKENS", defaults.response_tokens)),
+            persona_tokens=int(os.getenv("MOCK_LLM_PERSONA_TOKENS", defaults.persona_tokens)),
+            seed=int(os.getenv("MOCK_LLM_SEED", defaults.seed)),
+        )
+
+
+class MockClient:
+    """
+    A stand-in for the provider SDK clients that fabricates responses locally.
+
+    Output text and timing jitter are a pure function of the configuration and
+    the prompts, so repeated runs produce the same stream. Failures are drawn
+    from one seeded sequence shared by all calls, so a retried request can
+    succeed where the previous attempt failed.
+    """
+
+    def __init__(self, config: MockConfig):
+        """
+        Initialize the MockClient.
+
+        Args:
+            config: Latency and output settings.
+        """
+        self.config = config
+        self._failures = random.Random(config.seed)
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a synthetic completion.
+
+        Args:
+            system_prompt: The system prompt of the calling LLM.
+            user_prompt: The input prompt from the user.
+            max_tokens: The maximum number of tokens to generate.
+
+        Yields:
+            Response tokens, paced according to the configuration.
+
+        Raises:
+            MockProviderError: With probability config.error_rate.
+        """
+        rng = self._rng(system_prompt, user_prompt)
+        if self._failures.random() < self.config.error_rate:
+            await asyncio.sleep(self._delay(rng, self.config.ttft))
+            raise MockProviderError("Simulated provider failure")
+
+        tokens = self._tokens(rng, user_prompt, max_tokens)
+        interval = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(self._delay(rng, self.config.ttft if i == 0 else interval))
+            yield token
+
+    async def complete(self, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """
+        Return a synthetic completion in one piece, as a non-streaming call would.
+
+        Args:
+            system_prompt: The system prompt of the calling LLM.
+            user_prompt: The input prompt from the user.
+            max_tokens: The maximum number of tokens to generate.
+
+        Returns:
+            The full response text.
+        """
+        return "".join([token async for token in self.stream(system_prompt, user_prompt, max_tokens)])
+
+    async def close(self) -> None:
+        """Nothing to release; present for parity with the SDK clients."""
+
+    def _rng(self, system_prompt: str, user_prompt: str) -> random.Random:
+        digest = hashlib.sha256(
+            f"{self.config.seed}\0{system_prompt}\0{user_prompt}".encode("utf-8")
+        ).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _delay(self, rng: random.Random, base: float) -> float:
+        if base <= 0:
+            return 0.0
+        return max(0.0, base * (1 + rng.uniform(-self.config.jitter, self.config.jitter)))
+
+    def _tokens(self, rng: random.Random, user_prompt: str, max_tokens: int) -> List[str]:
+        persona_names = re.findall(r"Persona \d name: (.*)", user_prompt)
+        if len(persona_names) == 2:
+            personas = [
+                self._persona_xml(rng, user_prompt, name, stance)
+                for name, stance in zip(persona_names, ("in favour of", "against"))
+            ]
+            return re.findall(r"\S+\s*|\s+", "<personas>\n" + "\n".join(personas) + "</personas>")
+        single = re.search(r"Persona name: (.*)", user_prompt)
+        stance = re.search(r"Stance: (.*)", user_prompt)
+        if single and stance:
+            return re.findall(r"\S+\s*|\s+", self._persona_xml(rng, user_prompt, single.group(1), stance.group(1)))
+
+        count = min(self.config.response_tokens, max_tokens)
+        return [rng.choice(WORDS) + " " for _ in range(count)]
+
+    def _persona_xml(self, rng: random.Random, user_prompt: str, name: str, stance: str) -> str:
+        topic_match = re.search(r"Conversation topic: (.*)", user_prompt)
+        length_match = re.search(r"should not exceed (\d+) words", user_prompt)
+        topic = topic_match.group(1).strip() if topic_match else "the topic"
+        answer_length = length_match.group(1) if length_match else "150"
+        filler = " ".join(rng.choice(WORDS) for _ in range(self.config.persona_tokens))
+
+        name = name.strip()
+        return (
+            "<persona>\n"
+            f"<name>{name}</name>\n"
+            "<systemprompt>\n"
+            f"You are {name}, a witty debater arguing {stance.strip().lower()} {topic}.\n"
+            "Respond to the conversation history with humour and strong opposition.\n"
+            f"Keep every response under {answer_length} words.\n"
+            + (f"{filler}\n" if filler else "")
+            + "</systemprompt>\n"
+            "</persona>\n"
+        )
@@ -33,4 +33,34 @@ Example output format:
 </systemprompt>
 </persona>
 </personas>
-"""
\ No newline at end of file
+"""
+
+SET_SINGLE_PERSONA = """
+Generate one AI debater persona with its system prompt based on the following:
+Conversation topic: {debate_topic}
+Persona name: {name}
+Opponent name: {opponent}
+Stance: {stance} the topic
+The opponent's persona is written separately and takes the opposite stance.
+
+Create a detailed system prompt that:
+- Defines the persona's unique traits, background, and distinctive speech patterns
+- Provides a comprehensive approach to the debate topic from the persona's stance, including potential arguments and counterarguments
+- Instructs how to approach the debate with humor and wit
+- Encourages strong opposition to {opponent}'s viewpoints
+- Provides detailed guidelines for crafting entertaining, engaging, and thrilling responses
+- Ensures the persona is funny, oppositional, and captivating to read/watch
+- Includes CRITICAL instructions on how to incorporate and respond to the conversation history (which will be provided in a <history> element in future interactions)
+- Emphasizes that each response in the conversation should not exceed {answer_length} words
+- Suggests ways to maintain the persona's character while adapting to new information or unexpected arguments
+
+Important: Ensure your entire output is in XML format, with no additional explanations outside the XML structure!
+
+Example output format:
+<persona>
+<name></name>
+<systemprompt>
+[Detailed system prompt goes here]
+</systemprompt>
+</persona>
+"""
@@ -1,13 +1,11 @@
-DEBATE_PROMPT_TEMPLATE = '''
+DEBATE_OPENING_TEMPLATE = '''
 You are {current_llm_name}, locked in a hilarious debate with {opponent_llm_name} about {initial_question}.
 
-{question_or_continuation}
-
-Conversation history:
-{history}
+The messages that follow are the debate so far. Your own turns appear as your replies; {opponent_llm_name}'s turns are prefixed with their name.
+'''
 
-Opponent's last message: {opponent_last_message}
-Your last message: {current_llm_last_msg}
+DEBATE_TURN_TEMPLATE = '''
+{question_or_continuation}
 
 Craft a witty, devastating comeback that will leave the audience in stitches! Key points:
 
@@ -33,4 +31,4 @@ CRITICAL: Begin your response in a unique, surprising way. Absolutely NO repetit
 Objective: Reduce the audience to tears of laughter while utterly eviscerating {opponent_llm_name}'s arguments. Make every word count in this verbal sparring match!
 
 CRITICAL: Your response MUST be a maximum of {max_words} words.
-'''
\ No newline at end of file
+'''
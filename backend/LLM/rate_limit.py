@@ -0,0 +1,211 @@
+"""
+This module provides process-wide token-bucket rate limiters that budget both
+requests and estimated tokens per provider/model, queueing callers in arrival
+order instead of letting the provider reject them with 429s.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Requests and tokens per minute used when no environment override is set
+DEFAULT_LIMITS: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    "openai": (500, 200_000),
+    "claude": (50, 40_000),
+    "mock": (None, None),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate the number of tokens in a text (about four characters each).
+
+    Args:
+        text: The text to estimate.
+
+    Returns:
+        The estimated token count.
+    """
+    return len(text) // 4 + 1
+
+
+@dataclass
+class RateLimit:
+    """
+    Request and token budgets for one provider/model.
+
+    Attributes:
+        requests_per_minute: Maximum requests per minute, or None for no limit.
+        tokens_per_minute: Maximum tokens per minute, or None for no limit.
+    """
+
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, provider: str) -> "RateLimit":
+        """
+        Build the limits for a provider from <PROVIDER>_RPM and <PROVIDER>_TPM.
+
+        Setting a variable to 0 disables that limit.
+
+        Args:
+            provider: The LLM provider.
+
+        Returns:
+            The configured RateLimit.
+        """
+        default_rpm, default_tpm = DEFAULT_LIMITS.get(provider, (None, None))
+        rpm = os.getenv(f"{provider.upper()}_RPM")
+        tpm = os.getenv(f"{provider.upper()}_TPM")
+        rpm = float(rpm) if rpm is not None else default_rpm
+        tpm = float(tpm) if tpm is not None else default_tpm
+        return cls(requests_per_minute=rpm or None, tokens_per_minute=tpm or None)
+
+
+class TokenBucket:
+    """
+    A bucket that refills continuously up to its capacity.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize a full TokenBucket.
+
+        Args:
+            per_minute: Capacity of the bucket and amount refilled per minute.
+        """
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """
+        Return the seconds until the bucket holds the requested amount.
+
+        Requests larger than the capacity only wait for a full bucket.
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """
+        Remove an amount from the bucket.
+        """
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    An async limiter combining a request bucket and a token bucket.
+
+    Callers are served strictly in arrival order: while the head of the queue
+    waits for budget, later callers wait behind it.
+    """
+
+    def __init__(self, limit: RateLimit):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            limit: The request and token budgets.
+        """
+        self.limit = limit
+        self._requests = TokenBucket(limit.requests_per_minute) if limit.requests_per_minute else None
+        self._tokens = TokenBucket(limit.tokens_per_minute) if limit.tokens_per_minute else None
+        self._lock = asyncio.Lock()
+        self.queue_depth = 0
+        self.total_requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    async def acquire(self, tokens: int) -> float:
+        """
+        Wait until one request and the given number of tokens fit the budget.
+
+        Args:
+            tokens: Estimated tokens for the request (prompt plus max_tokens).
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        start = time.monotonic()
+        self.queue_depth += 1
+        try:
+            async with self._lock:
+                while True:
+                    delay = max(
+                        self._requests.time_until(1) if self._requests else 0.0,
+                        self._tokens.time_until(tokens) if self._tokens else 0.0,
+                    )
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                if self._requests:
+                    self._requests.take(1)
+                if self._tokens:
+                    self._tokens.take(tokens)
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - start
+        self.total_requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.last_wait = waited
+        return waited
+
+    def stats(self) -> dict:
+        """
+        Return the current queue depth, wait times and remaining budget.
+        """
+        return {
+            "requests_per_minute": self.limit.requests_per_minute,
+            "tokens_per_minute": self.limit.tokens_per_minute,
+            "queue_depth": self.queue_depth,
+            "total_requests": self.total_requests,
+            "average_wait": self.total_wait / self.total_requests if self.total_requests else 0.0,
+            "max_wait": self.max_wait,
+            "last_wait": self.last_wait,
+        }
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+
+
+def get_rate_limiter(provider: str, model: str) -> Optional[RateLimiter]:
+    """
+    Return the shared limiter for a provider/model, creating it on first use.
+
+    Args:
+        provider: The LLM provider.
+        model: The model name.
+
+    Returns:
+        The RateLimiter, or None if the provider has no limits configured.
+    """
+    key = (provider, model)
+    if key not in _limiters:
+        limit = RateLimit.from_env(provider)
+        if limit.requests_per_minute is None and limit.tokens_per_minute is None:
+            return None
+        _limiters[key] = RateLimiter(limit)
+    return _limiters[key]
+
+
+def rate_limiter_stats() -> Dict[str, dict]:
+    """
+    Return the stats of every limiter, keyed by "provider/model".
+    """
+    return {f"{provider}/{model}": limiter.stats() for (provider, model), limiter in _limiters.items()}
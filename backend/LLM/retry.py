@@ -0,0 +1,59 @@
+"""
+This module defines the retry policy AsyncLLM applies to transient provider
+errors.
+"""
+
+import os
+import random
+from dataclasses import dataclass
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Attributes:
+        max_attempts: Attempts per provider, including the first one; values
+            below 1 (e.g. 0 for "no retries") mean a single attempt.
+        base_delay: Backoff ceiling in seconds before the first retry.
+        max_delay: Upper bound for the backoff ceiling.
+        multiplier: Growth factor of the ceiling after every attempt.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    multiplier: float = 2.0
+
+    def __post_init__(self):
+        self.max_attempts = max(1, self.max_attempts)
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """
+        Build a retry policy from LLM_RETRY_* environment variables.
+
+        Returns:
+            A RetryPolicy with defaults for any variable that is not set.
+        """
+        defaults = cls()
+        return cls(
+            max_attempts=int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", defaults.max_attempts)),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", defaults.base_delay)),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", defaults.max_delay)),
+            multiplier=float(os.getenv("LLM_RETRY_MULTIPLIER", defaults.multiplier)),
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Return the sleep before the retry following a failed attempt.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed.
+
+        Returns:
+            A random delay between 0 and the capped exponential ceiling.
+        """
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return random.uniform(0, ceiling)
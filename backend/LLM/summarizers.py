@@ -0,0 +1,225 @@
+"""
+This module defines the summarization strategies ConversationHistory uses to
+compact old turns: an LLM call, or a local extractive summary that selects
+the most representative sentences with TF-IDF scoring in NumPy.
+"""
+
+import asyncio
+import math
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from LLM.base import AsyncLLM
+from LLM.deadlines import Deadline
+
+SUMMARIZERS = ("llm", "extractive")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9']+")
+# "Name: text" lines, as rendered by the extractive summarizer
+_SPEAKER_PREFIX = re.compile(r"^([^:\n]{1,40}):\s+(.*)$")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its "
+    "me my not of on or our she so that the their them they this to was we "
+    "were what when which who will with you your".split()
+)
+
+
+class Summarizer:
+    """
+    A strategy for summarizing conversation turns and merging summaries.
+    """
+
+    async def summarize(self, turns: List[Tuple[str, str]]) -> str:
+        """
+        Summarize consecutive turns.
+
+        Args:
+            turns: The turns as (sender, content) pairs, oldest first.
+
+        Returns:
+            The summary text.
+
+        Raises:
+            LLMError: If an LLM-based summarizer fails.
+        """
+        raise NotImplementedError
+
+    async def merge(self, summaries: List[str]) -> str:
+        """
+        Combine summaries of consecutive parts of a conversation into one.
+
+        Args:
+            summaries: The summary texts, oldest first.
+
+        Returns:
+            The merged summary text.
+
+        Raises:
+            LLMError: If an LLM-based summarizer fails.
+        """
+        raise NotImplementedError
+
+
+class LLMSummarizer(Summarizer):
+    """
+    Asks an LLM for the summaries.
+    """
+
+    def __init__(self, llm: AsyncLLM):
+        """
+        Initialize the LLMSummarizer.
+
+        Args:
+            llm: The LLM writing the summaries.
+        """
+        self.llm = llm
+
+    async def summarize(self, turns: List[Tuple[str, str]]) -> str:
+        context = "\n".join(f"{sender}: {content}" for sender, content in turns)
+        return await self._complete(f"Summarize the following conversation concisely:\n\n{context}\n\nSummary:")
+
+    async def merge(self, summaries: List[str]) -> str:
+        context = "\n\n".join(summaries)
+        return await self._complete(
+            "Combine the following summaries of consecutive parts of a conversation into "
+            f"one concise summary:\n\n{context}\n\nSummary:"
+        )
+
+    async def _complete(self, prompt: str) -> str:
+        response = ""
+        # Summaries are not part of any turn, so they get a deadline of their own
+        async for chunk in self.llm(prompt, deadline=Deadline.from_env("SUMMARY")):
+            response += chunk
+        return response
+
+
+class ExtractiveSummarizer(Summarizer):
+    """
+    Keeps the sentences closest to the overall content of the turns, without
+    any LLM call.
+
+    Sentences are weighted with TF-IDF and scored by cosine similarity to
+    their centroid; selection then penalizes similarity to sentences already
+    picked, so the summary does not repeat one argument. The selected
+    sentences keep their original order and speaker.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_sentences: int = 12, redundancy: float = 0.3):
+        """
+        Initialize the ExtractiveSummarizer.
+
+        Args:
+            ratio: Fraction of the sentences to keep.
+            max_sentences: Upper bound on the sentences kept, which also
+                bounds merged summaries.
+            redundancy: Weight of the penalty for similarity to the
+                sentences already selected (0 disables it).
+        """
+        self.ratio = ratio
+        self.max_sentences = max_sentences
+        self.redundancy = redundancy
+
+    async def summarize(self, turns: List[Tuple[str, str]]) -> str:
+        units = [
+            (sender, sentence)
+            for sender, content in turns
+            for sentence in _split_sentences(content)
+        ]
+        return await asyncio.to_thread(self._extract, units)
+
+    async def merge(self, summaries: List[str]) -> str:
+        units = []
+        for summary in summaries:
+            for line in summary.splitlines():
+                match = _SPEAKER_PREFIX.match(line.strip())
+                sender, text = match.groups() if match else (None, line)
+                units.extend((sender, sentence) for sentence in _split_sentences(text))
+        return await asyncio.to_thread(self._extract, units)
+
+    def _extract(self, units: List[Tuple[Optional[str], str]]) -> str:
+        keep = min(self.max_sentences, max(1, math.ceil(len(units) * self.ratio)))
+        selected = self._select([sentence for _, sentence in units], keep)
+        return _render([units[i] for i in selected])
+
+    def _select(self, sentences: List[str], keep: int) -> List[int]:
+        """
+        Return the indices of the sentences to keep, in their original order.
+        """
+        if len(sentences) <= keep:
+            return list(range(len(sentences)))
+
+        vocabulary = {}
+        rows, columns = [], []
+        for i, sentence in enumerate(sentences):
+            for word in _WORD.findall(sentence.lower()):
+                if word not in _STOPWORDS:
+                    rows.append(i)
+                    columns.append(vocabulary.setdefault(word, len(vocabulary)))
+        if not vocabulary:
+            return list(range(keep))
+
+        tf = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+        np.add.at(tf, (rows, columns), 1.0)
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+        weights = tf * idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        vectors = weights / np.where(norms == 0, 1.0, norms)
+
+        relevance = vectors @ vectors.mean(axis=0)
+        similarity = vectors @ vectors.T
+        selected: List[int] = []
+        # Highest similarity of every sentence to the ones selected so far
+        closest = np.zeros(len(sentences), dtype=np.float32)
+        available = np.ones(len(sentences), dtype=bool)
+        for _ in range(keep):
+            scores = np.where(available, relevance - self.redundancy * closest, -np.inf)
+            best = int(np.argmax(scores))
+            selected.append(best)
+            available[best] = False
+            closest = np.maximum(closest, similarity[best])
+        return sorted(selected)
+
+
+def _split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _render(units: List[Tuple[Optional[str], str]]) -> str:
+    # One line per run of sentences from the same speaker
+    lines: List[Tuple[Optional[str], List[str]]] = []
+    for sender, sentence in units:
+        if lines and lines[-1][0] == sender:
+            lines[-1][1].append(sentence)
+        else:
+            lines.append((sender, [sentence]))
+    return "\n".join(
+        f"{sender}: {' '.join(sentences)}" if sender else " ".join(sentences)
+        for sender, sentences in lines
+    )
+
+
+def create_summarizer(kind: str, llm: Optional[AsyncLLM] = None) -> Summarizer:
+    """
+    Build the summarizer selected for a debate.
+
+    Args:
+        kind: "llm" or "extractive".
+        llm: The LLM used by the "llm" summarizer.
+
+    Returns:
+        The Summarizer.
+
+    Raises:
+        ValueError: If kind is unknown, or "llm" without an LLM.
+    """
+    if kind == "extractive":
+        return ExtractiveSummarizer()
+    if kind == "llm":
+        if llm is None:
+            raise ValueError("The llm summarizer needs an LLM.")
+        return LLMSummarizer(llm)
+    raise ValueError(f"Unknown summarizer {kind!r}. Choose one of {', '.join(SUMMARIZERS)}.")
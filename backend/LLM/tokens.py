@@ -0,0 +1,78 @@
+"""
+This module counts tokens with the tokenizer of the provider a text is sent
+to, falling back to length-based estimates when no tokenizer is available.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Characters per token used for estimates. Anthropic publishes no offline
+# tokenizer and its tokens run slightly shorter than OpenAI's.
+CHARS_PER_TOKEN = {
+    "openai": 4.0,
+    "claude": 3.5,
+    "mock": 4.0,
+}
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    # tiktoken downloads encodings on first use; fall back to estimates when offline
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for {model}, estimating token counts: {e}")
+        return None
+
+
+class TokenCounter:
+    """
+    Counts the tokens of texts for one provider and model.
+    """
+
+    def __init__(self, encoding: Optional[tiktoken.Encoding] = None, chars_per_token: float = 4.0):
+        """
+        Initialize the TokenCounter.
+
+        Args:
+            encoding: The exact tokenizer, if available.
+            chars_per_token: Characters per token used when there is no tokenizer.
+        """
+        self.encoding = encoding
+        self.chars_per_token = chars_per_token
+
+    @property
+    def exact(self) -> bool:
+        """
+        Whether counts come from the real tokenizer rather than an estimate.
+        """
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+        """
+        if self.encoding is None:
+            return int(len(text) / self.chars_per_token)
+        return len(self.encoding.encode(text))
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(provider: str, model: str) -> TokenCounter:
+    """
+    Return the shared TokenCounter of a provider and model.
+
+    Args:
+        provider: "openai", "claude" or "mock".
+        model: The model name.
+
+    Returns:
+        A counter using tiktoken for OpenAI models, estimates otherwise.
+    """
+    encoding = _load_encoding(model) if provider == "openai" else None
+    return TokenCounter(encoding, CHARS_PER_TOKEN.get(provider, 4.0))
@@ -0,0 +1,174 @@
+"""
+This module finds near-duplicate debate topics. Topics are normalized (case,
+whitespace and punctuation folded) and compared by the Jaccard similarity of
+their shingles: character trigrams, which tolerate small spelling changes,
+and word bigrams, which keep some word order. MinHash signatures bucketed
+with locality-sensitive hashing narrow the stored topics down to likely
+matches, whose similarity is then computed exactly and capped by their
+sequence ratio, which drops when words are reordered.
+"""
+
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, Hashable, List, Set, Tuple
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Hashes are taken modulo this Mersenne prime, so products stay below 2**62
+_PRIME = (1 << 31) - 1
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Fold case, punctuation and whitespace, e.g. "Is a hot-dog a Sandwich?"
+    becomes "is a hot dog a sandwich".
+    """
+    text = unicodedata.normalize("NFKC", topic).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """
+    Return the character trigrams and word bigrams of a normalized text.
+    """
+    padded = f" {text} "
+    result = {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+    words = text.split()
+    # Prefixed so a bigram never equals a trigram
+    result.update(f"\0{first} {second}" for first, second in zip(words, words[1:]))
+    return frozenset(result)
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    """
+    Return the Jaccard similarity of two shingle sets.
+    """
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def similarity(first: str, second: str) -> float:
+    """
+    Return the similarity of two normalized texts: the lower of their
+    shingle Jaccard similarity and difflib's sequence ratio. Shingles barely
+    change when a comparison is reversed ("cats vs dogs", "dogs vs cats");
+    the sequence ratio does.
+    """
+    return min(jaccard(shingles(first), shingles(second)), _sequence_ratio(first, second))
+
+
+def _sequence_ratio(first: str, second: str) -> float:
+    return SequenceMatcher(None, first, second, autojunk=False).ratio()
+
+
+class MinHashIndex:
+    """
+    Finds the stored texts most similar to a query.
+
+    Each text's MinHash signature is split into bands; texts sharing any band
+    are candidates. With the default 16 bands of 4 rows, a pair at
+    similarity 0.7 becomes a candidate with probability 0.99, and at 0.5
+    with probability 0.64; use more bands for lower thresholds.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 0):
+        """
+        Initialize the MinHashIndex.
+
+        Args:
+            num_perm: Number of hash functions in a signature.
+            bands: Number of LSH bands; must divide num_perm.
+            seed: Seed of the hash functions.
+        """
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, bytes], Set[Hashable]] = defaultdict(set)
+        # id -> (normalized text, shingles, signature)
+        self._items: Dict[Hashable, Tuple[str, FrozenSet[str], np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: Hashable, text: str) -> None:
+        """
+        Index a text under an id, replacing the text previously indexed under it.
+        """
+        self.remove(item)
+        normalized = normalize_topic(text)
+        shingle_set = shingles(normalized)
+        signature = self._signature(shingle_set)
+        self._items[item] = (normalized, shingle_set, signature)
+        for band in self._bands(signature):
+            self._buckets[band].add(item)
+
+    def remove(self, item: Hashable) -> None:
+        """
+        Remove an id from the index, if present.
+        """
+        entry = self._items.pop(item, None)
+        if entry is None:
+            return
+        for band in self._bands(entry[2]):
+            self._buckets[band].discard(item)
+            if not self._buckets[band]:
+                del self._buckets[band]
+
+    def clear(self) -> None:
+        """
+        Remove every text.
+        """
+        self._buckets.clear()
+        self._items.clear()
+
+    def query(self, text: str, threshold: float) -> List[Tuple[float, Hashable]]:
+        """
+        Find the indexed texts at least threshold similar to a text, see
+        similarity().
+
+        Returns:
+            (similarity, id) pairs, most similar first.
+        """
+        normalized = normalize_topic(text)
+        shingle_set = shingles(normalized)
+        candidates = set()
+        for band in self._bands(self._signature(shingle_set)):
+            candidates.update(self._buckets.get(band, ()))
+        matches = []
+        for item in candidates:
+            candidate, candidate_shingles, _ = self._items[item]
+            score = jaccard(shingle_set, candidate_shingles)
+            # The sequence ratio only lowers the score; skip it below the threshold
+            if score < threshold:
+                continue
+            score = min(score, _sequence_ratio(normalized, candidate))
+            if score >= threshold:
+                matches.append((score, item))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches
+
+    def _signature(self, shingle_set: FrozenSet[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def _bands(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -35,4 +35,46 @@ def get_persona_db():
 def create_tables():
     from app.models import Base
     Base.metadata.create_all(bind=debate_engine)
-    Base.metadata.create_all(bind=persona_engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=persona_engine)
+    add_missing_columns(debate_engine)
+    add_missing_columns(persona_engine)
+    add_missing_indexes(debate_engine)
+    add_missing_indexes(persona_engine)
+
+def add_missing_columns(engine):
+    # create_all never alters existing tables, so add columns introduced since a database was created
+    from app.models import Base
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                connection.execute(text(ddl))
+
+def add_missing_indexes(engine):
+    # Likewise, create indexes declared on tables that already existed
+    from app.models import Base
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                remove_duplicates(engine, table, index)
+            index.create(bind=engine)
+
+def remove_duplicates(engine, table, index):
+    # Rows written before a unique index existed may repeat its key; keep the oldest of each
+    columns = ", ".join(column.name for column in index.columns)
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"DELETE FROM {table.name} WHERE id NOT IN (SELECT MIN(id) FROM {table.name} GROUP BY {columns})"
+        ))
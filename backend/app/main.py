@@ -1,10 +1,11 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from app.routes import debate, websocket
+from app.routes import debate, websocket, stats
 from app.database import create_tables, get_persona_db
 from app.models import Persona
 from app.schemas import PersonaListResponse, PersonaListItem
+from LLM.clients import close_clients
 
 # Create database tables
 create_tables()
@@ -23,6 +24,12 @@ app.add_middleware(
 # Include routers
 app.include_router(debate.router)
 app.include_router(websocket.router)
+app.include_router(stats.router)
+
+@app.on_event("shutdown")
+async def shutdown_llm_clients():
+    # Close the shared provider connection pools
+    await close_clients()
 
 @app.get("/")
 async def root():
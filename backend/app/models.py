@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import pytz
@@ -16,28 +16,56 @@ class Debate(Base):
     name1 = Column(String)
     name2 = Column(String)
     provider = Column(String)
+    fallback_provider = Column(String, nullable=True)
+    summarizer = Column(String, server_default="llm")
     created_at = Column(DateTime(timezone=True), default=pst_now)
     questions = Column(Text)  # Store as JSON string
     answer_length = Column(Integer)
     persona1 = Column(Text)  # Store as JSON string
     persona2 = Column(Text)  # Store as JSON string
     turns = relationship("DebateTurn", back_populates="debate")
+    summaries = relationship("DebateSummary", back_populates="debate")
 
 class DebateTurn(Base):
     __tablename__ = "debate_turns"
 
     id = Column(Integer, primary_key=True, index=True)
-    debate_id = Column(Integer, ForeignKey("debates.id"))
+    debate_id = Column(Integer, ForeignKey("debates.id"), index=True)
     speaker = Column(String)
     content = Column(Text)
     prompt = Column(Text)
     turn_number = Column(Integer)
+    status = Column(String, default="completed", server_default="completed")  # "completed" or "aborted"
     created_at = Column(DateTime(timezone=True), default=pst_now)
 
     debate = relationship("Debate", back_populates="turns")
 
+class DebateSummary(Base):
+    __tablename__ = "debate_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    debate_id = Column(Integer, ForeignKey("debates.id"), index=True)
+    content = Column(Text)
+    first_turn = Column(Integer, nullable=True)  # First turn covered; NULL: the turn after the previous summary
+    turn_number = Column(Integer)  # Last turn covered by the summary
+    created_at = Column(DateTime(timezone=True), default=pst_now)
+
+    debate = relationship("Debate", back_populates="summaries")
+
+class DebateSessionState(Base):
+    __tablename__ = "debate_sessions"
+
+    debate_id = Column(Integer, ForeignKey("debates.id"), primary_key=True)
+    version = Column(Integer, nullable=False)  # Incremented on every saved turn
+    data = Column(Text)  # Store as JSON string
+    updated_at = Column(DateTime(timezone=True), default=pst_now, onupdate=pst_now)
+
 class Persona(Base):
     __tablename__ = "personas"
+    __table_args__ = (
+        # One persona pair per cache key
+        Index("ix_personas_cache_key", "topic", "name1", "name2", "answer_length", "provider", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     topic = Column(String, index=True)
@@ -49,4 +77,10 @@ class Persona(Base):
     persona2_system_prompt = Column(Text)
     answer_length = Column(Integer)
     provider = Column(String)
-    created_at = Column(DateTime(timezone=True), default=pst_now)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), default=pst_now)
+
+class PersonaLock(Base):
+    __tablename__ = "persona_locks"
+
+    key = Column(String, primary_key=True)  # Hash of the persona cache key
+    expires_at = Column(Float, nullable=False)  # Unix time after which another worker may take over
@@ -0,0 +1,489 @@
+"""
+This module makes sure each persona pair is generated once. Debates with the
+same topic, names, answer length and provider share a pair: requests for a
+pair that is being generated in this process join that generation, and a
+lock row in the persona database keeps other workers from generating it at
+the same time. Stored pairs are kept in an in-process LRU cache, so popular
+matchups are served without reading the database, and a pair stored for a
+near-duplicate topic is reused instead of generating a new one.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.database import PersonaSessionLocal
+from app.models import Persona, PersonaLock
+from LLM.async_utils import find_personas, save_personas, stream_personas
+from LLM.topics import MinHashIndex
+
+logger = logging.getLogger(__name__)
+
+# (topic, name1, name2, answer_length, provider), with the names sorted
+PersonaKey = Tuple[str, str, str, int, str]
+Personas = Tuple[Dict[str, str], Dict[str, str]]
+
+
+class PersonaCache:
+    """
+    Keeps the most recently used stored persona pairs in memory.
+
+    Stored pairs never change, so entries only go stale when rows are
+    deleted: deletes through a persona database session drop the affected
+    entries.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the PersonaCache.
+
+        Args:
+            max_entries: Maximum number of pairs kept; 0 disables the cache.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PersonaKey, Personas]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PersonaCache":
+        """
+        Build a cache from PERSONA_CACHE_MAX_ENTRIES.
+        """
+        return cls(max_entries=int(os.getenv("PERSONA_CACHE_MAX_ENTRIES", 1024)))
+
+    def get(self, key: PersonaKey) -> Optional[Personas]:
+        """
+        Look up a pair; the returned dicts are shared and must not be modified.
+        """
+        personas = self._entries.get(key)
+        if personas is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return personas
+
+    def put(self, key: PersonaKey, personas: Personas) -> None:
+        """
+        Remember a stored pair, evicting the least recently used beyond max_entries.
+        """
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = personas
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[PersonaKey] = None) -> None:
+        """
+        Drop one pair, or every pair when key is None.
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current size.
+        """
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SimilarTopics:
+    """
+    Matches a persona cache key to a stored pair of a near-duplicate topic
+    with the same names, answer length and provider.
+
+    Topics are indexed from the Persona table; every lookup first indexes
+    the rows added since the previous one, including those of other
+    workers. See LLM.topics for the similarity measure. Lexical similarity
+    cannot tell a paraphrase from a different question ("voting age 16"
+    against "18" scores 0.87), so the default threshold merges topics that
+    differ in case, punctuation or spacing, and only the longest topics
+    differing by a letter.
+    """
+
+    def __init__(self, threshold: float = 0.9):
+        """
+        Initialize the SimilarTopics.
+
+        Args:
+            threshold: Minimum similarity of a reused topic, in (0, 1]; 1
+                still merges topics equal after normalization. 0 disables
+                matching.
+        """
+        self.threshold = threshold
+        self._index = MinHashIndex()
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.saved_generations = 0
+
+    @classmethod
+    def from_env(cls) -> "SimilarTopics":
+        """
+        Build the matcher from PERSONA_TOPIC_SIMILARITY.
+        """
+        return cls(threshold=float(os.getenv("PERSONA_TOPIC_SIMILARITY", 0.9)))
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def find(self, key: PersonaKey) -> Optional[PersonaKey]:
+        """
+        Return the key of the most similar stored topic, if any is similar
+        enough. Blocking; run it in a thread from async code.
+        """
+        topic, *rest = key
+        with self._lock:
+            self._refresh()
+            self.lookups += 1
+            for _, match in self._index.query(topic, self.threshold):
+                if match != key and list(match[1:]) == rest:
+                    return match
+        return None
+
+    def remove(self, key: PersonaKey) -> None:
+        """
+        Forget the topic of a deleted pair.
+        """
+        with self._lock:
+            self._index.remove(key)
+
+    def invalidate(self) -> None:
+        """
+        Forget every topic; the next lookup indexes the table again.
+        """
+        with self._lock:
+            self._index.clear()
+            self._last_id = 0
+
+    def stats(self) -> dict:
+        """
+        Return the threshold, lookup counters and the number of topics indexed.
+        """
+        return {
+            "threshold": self.threshold,
+            "topics": len(self._index),
+            "lookups": self.lookups,
+            "saved_generations": self.saved_generations,
+        }
+
+    def _refresh(self) -> None:
+        with PersonaSessionLocal() as persona_db:
+            rows = (
+                persona_db.query(Persona.id, Persona.topic, Persona.name1, Persona.name2, Persona.answer_length, Persona.provider)
+                .filter(Persona.id > self._last_id)
+                .order_by(Persona.id)
+                .all()
+            )
+        for row in rows:
+            self._index.add(tuple(row[1:]), row.topic)
+            self._last_id = row.id
+
+
+class PersonaGeneration:
+    """
+    A generation of one persona pair, shared by every request for it.
+
+    Attributes:
+        first: Resolves to the first persona as soon as it is complete.
+        done: Resolves to both personas once they are stored.
+    """
+
+    def __init__(self):
+        loop = asyncio.get_running_loop()
+        self.first: asyncio.Future = loop.create_future()
+        self.done: asyncio.Future = loop.create_future()
+        self.task: Optional[asyncio.Task] = None
+
+    def _resolve(self, personas: Personas) -> None:
+        if not self.first.done():
+            self.first.set_result(personas[0])
+        self.done.set_result(personas)
+
+    def _fail(self, error: Exception) -> None:
+        for future in (self.first, self.done):
+            if not future.done():
+                future.set_exception(error)
+                # Retrieved here so requests that left early do not leave it unhandled
+                future.exception()
+
+    def _cancel(self) -> None:
+        self.first.cancel()
+        self.done.cancel()
+
+
+class PersonaFlights:
+    """
+    Runs at most one generation per persona pair.
+
+    Within the process, requests for a pair being generated get the running
+    PersonaGeneration. Across processes, the worker holding the pair's lock
+    row generates it and the others poll the Persona table until it is
+    stored; a lock left by a worker that died expires after lock_ttl.
+    """
+
+    def __init__(self, lock_ttl: float = 300.0, poll_interval: float = 0.5):
+        """
+        Initialize the PersonaFlights.
+
+        Args:
+            lock_ttl: Seconds a lock row stays valid; 0 disables the
+                cross-process lock.
+            poll_interval: Seconds between Persona table reads while another
+                worker generates a pair.
+        """
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._running: Dict[PersonaKey, PersonaGeneration] = {}
+        self.started = 0
+        self.joined = 0
+        self.generated = 0
+        self.waited_remote = 0
+
+    @classmethod
+    def from_env(cls) -> "PersonaFlights":
+        """
+        Build the flights from PERSONA_LOCK_* environment variables.
+        """
+        return cls(
+            lock_ttl=float(os.getenv("PERSONA_LOCK_TTL", 300)),
+            poll_interval=float(os.getenv("PERSONA_LOCK_POLL_INTERVAL", 0.5)),
+        )
+
+    def generate(self, key: PersonaKey, mode: str = "combined") -> PersonaGeneration:
+        """
+        Return the running generation of a pair, starting one if there is none.
+
+        Args:
+            key: The pair's cache key.
+            mode: How a new generation asks for the personas, see
+                stream_personas; a running generation keeps its own mode.
+
+        Returns:
+            The generation, which stores the pair before resolving done.
+        """
+        generation = self._running.get(key)
+        if generation is not None:
+            self.joined += 1
+            return generation
+        generation = PersonaGeneration()
+        self._running[key] = generation
+        self.started += 1
+        generation.task = asyncio.create_task(self._run(key, mode, generation))
+        return generation
+
+    def stats(self) -> dict:
+        """
+        Return generation counters: generations started and joined, pairs
+        generated with the LLM, and pairs found stored by another worker.
+        """
+        return {
+            "running": len(self._running),
+            "started": self.started,
+            "joined": self.joined,
+            "generated": self.generated,
+            "waited_remote": self.waited_remote,
+        }
+
+    async def _run(self, key: PersonaKey, mode: str, generation: PersonaGeneration) -> None:
+        try:
+            generation._resolve(await self._generate(key, mode, generation))
+        except asyncio.CancelledError:
+            generation._cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Generating personas for {key[0]!r} failed: {str(e)}")
+            generation._fail(e)
+        finally:
+            del self._running[key]
+
+    async def _generate(self, key: PersonaKey, mode: str, generation: PersonaGeneration) -> Personas:
+        lock = _lock_key(key)
+        waited = False
+        if self.lock_ttl:
+            while not await asyncio.to_thread(self._acquire, lock):
+                # Another worker generates the pair; use it once stored
+                waited = True
+                personas = await asyncio.to_thread(_find, key)
+                if personas is not None:
+                    self.waited_remote += 1
+                    return personas
+                await asyncio.sleep(self.poll_interval)
+        try:
+            # The pair may have been stored since the caller looked it up
+            personas = await asyncio.to_thread(_find, key)
+            if personas is not None:
+                if waited:
+                    self.waited_remote += 1
+                return personas
+            if waited:
+                # The lock expired or was released without a stored pair
+                logger.warning(f"Took over the persona generation of {key[0]!r}")
+
+            self.generated += 1
+            generated = []
+            async for persona in stream_personas(*key, mode=mode):
+                generated.append(persona)
+                if len(generated) == 1:
+                    generation.first.set_result(persona)
+            if len(generated) != 2:
+                raise ValueError(f"Expected 2 personas, but got {len(generated)}")
+            await asyncio.to_thread(_save, key, generated)
+            # A pair stored concurrently under the key wins; read it back on next use
+            get_persona_cache().invalidate(key)
+            return tuple(generated)
+        finally:
+            if self.lock_ttl:
+                await asyncio.to_thread(self._release, lock)
+
+    def _acquire(self, lock: str) -> bool:
+        now = time.time()
+        with PersonaSessionLocal() as db:
+            # Inserts the lock, or takes over an expired one
+            result = db.execute(
+                insert(PersonaLock)
+                .values(key=lock, expires_at=now + self.lock_ttl)
+                .on_conflict_do_update(
+                    index_elements=[PersonaLock.key],
+                    set_={"expires_at": now + self.lock_ttl},
+                    where=PersonaLock.expires_at < now,
+                )
+            )
+            db.commit()
+            return result.rowcount == 1
+
+    def _release(self, lock: str) -> None:
+        with PersonaSessionLocal() as db:
+            db.query(PersonaLock).filter(PersonaLock.key == lock).delete()
+            db.commit()
+
+
+def _lock_key(key: PersonaKey) -> str:
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def lookup_personas(persona_db: Session, key: PersonaKey) -> Optional[Personas]:
+    """
+    Return the stored pair of a key, from the in-process cache when possible.
+
+    Args:
+        persona_db: Session of the persona database, used on a cache miss.
+        key: The pair's cache key, with the names sorted.
+
+    Returns:
+        The two personas as {"name", "system_prompt"} dicts, or None.
+    """
+    cache = get_persona_cache()
+    personas = cache.get(key)
+    if personas is None:
+        personas = find_personas(persona_db, *key)
+        if personas is not None:
+            cache.put(key, personas)
+    return personas
+
+
+async def find_similar_personas(persona_db: Session, key: PersonaKey) -> Optional[Personas]:
+    """
+    Return the stored pair of a near-duplicate topic, when the exact key has none.
+
+    Args:
+        persona_db: Session of the persona database.
+        key: The pair's cache key, with the names sorted.
+
+    Returns:
+        The two personas as {"name", "system_prompt"} dicts, or None.
+    """
+    similar = get_similar_topics()
+    if not similar.enabled:
+        return None
+    match = await asyncio.to_thread(similar.find, key)
+    if match is None:
+        return None
+    # Deleted by another worker since it was indexed
+    personas = lookup_personas(persona_db, match)
+    if personas is not None:
+        similar.saved_generations += 1
+        logger.info(f"Reusing the personas of {match[0]!r} for {key[0]!r}")
+    return personas
+
+
+def _key_of(persona: Persona) -> PersonaKey:
+    return (persona.topic, persona.name1, persona.name2, persona.answer_length, persona.provider)
+
+
+@event.listens_for(PersonaSessionLocal, "after_flush")
+def _invalidate_deleted(session: Session, flush_context) -> None:
+    for instance in session.deleted:
+        if isinstance(instance, Persona):
+            get_persona_cache().invalidate(_key_of(instance))
+            get_similar_topics().remove(_key_of(instance))
+
+
+@event.listens_for(PersonaSessionLocal, "do_orm_execute")
+def _invalidate_bulk_delete(orm_execute_state) -> None:
+    # The rows a bulk delete matches are unknown; drop every pair
+    if orm_execute_state.is_delete and orm_execute_state.bind_mapper is not None \
+            and orm_execute_state.bind_mapper.class_ is Persona:
+        get_persona_cache().invalidate()
+        get_similar_topics().invalidate()
+
+
+def _find(key: PersonaKey) -> Optional[Personas]:
+    # The table, not the cache: it tells whether another worker stored the pair
+    with PersonaSessionLocal() as persona_db:
+        return find_personas(persona_db, *key)
+
+
+def _save(key: PersonaKey, personas: List[Dict[str, str]]) -> None:
+    with PersonaSessionLocal() as persona_db:
+        save_personas(persona_db, *key, personas)
+
+
+_persona_cache: Optional[PersonaCache] = None
+_persona_flights: Optional[PersonaFlights] = None
+_similar_topics: Optional[SimilarTopics] = None
+
+
+def get_persona_cache() -> PersonaCache:
+    """
+    Return the process-wide PersonaCache configured through the environment.
+    """
+    global _persona_cache
+    if _persona_cache is None:
+        _persona_cache = PersonaCache.from_env()
+    return _persona_cache
+
+
+def get_persona_flights() -> PersonaFlights:
+    """
+    Return the process-wide PersonaFlights configured through the environment.
+    """
+    global _persona_flights
+    if _persona_flights is None:
+        _persona_flights = PersonaFlights.from_env()
+    return _persona_flights
+
+
+def get_similar_topics() -> SimilarTopics:
+    """
+    Return the process-wide SimilarTopics configured through the environment.
+    """
+    global _similar_topics
+    if _similar_topics is None:
+        _similar_topics = SimilarTopics.from_env()
+    return _similar_topics
@@ -1,4 +1,5 @@
 from .debate import router as debate_router
 from .websocket import router as websocket_router
+from .stats import router as stats_router
 
-__all__ = ['debate_router', 'websocket_router']
\ No newline at end of file
+__all__ = ['debate_router', 'websocket_router', 'stats_router']
\ No newline at end of file
@@ -1,5 +1,5 @@
-from app.models import Debate, DebateTurn
-from LLM.prompts.clash import DEBATE_PROMPT_TEMPLATE
+from app.models import Debate, DebateSummary, DebateTurn
+from LLM.prompts.clash import DEBATE_OPENING_TEMPLATE, DEBATE_TURN_TEMPLATE
 from app.schemas import (
     DebateRequest, DebateResponse, DebateSchema, OneTurnDebateResponse,
     PersonaResponse, DebateHistoryResponse, DebateHistoryItem, TurnSchema
@@ -8,78 +8,140 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from app.database import get_debate_db, get_persona_db
+from app.sessions import DebateSession, PersonaUnavailableError, SessionConflictError, get_session_manager
 from app.schemas import DebateRequest, DebateResponse
 from app.models import Debate
-from LLM.base import AsyncLLM
-from LLM.ConversationHandler import ConversationHistory
-from LLM.async_utils import generate_debate_personas
+from LLM.budget import PromptBudget, fit_prompt
+from LLM.deadlines import Deadline
+from LLM.errors import LLMError, LLMTimeoutError
+from app.personas import find_similar_personas, get_persona_flights, lookup_personas
+import asyncio
 import json
 import logging
+from typing import Dict, List, Optional, Tuple
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-debate_state = {
-    "llm1": None,
-    "llm2": None,
-    "history": None,
-    "current_llm": None,
-    "opponent_llm": None,
-    "turn_count": 0,
-    "questions": [],
-    "personas": None,
-    "answer_length": 100,
-    "current_debate_id": None
-}
+def generate_prompt(session: DebateSession) -> Tuple[List[Dict[str, str]], PromptBudget]:
+    """
+    Build the next turn's prompt as a multi-turn conversation.
 
-def generate_prompt():
-    current_llm = debate_state["current_llm"]
-    opponent_llm = debate_state["opponent_llm"]
-    history = debate_state["history"]
-    turn_count = debate_state["turn_count"]
-    question = debate_state["questions"][0] if turn_count == 0 else ""
-    max_words = debate_state["answer_length"]
+    The opening message and every past turn are identical from one turn to
+    the next, so only the final instruction message changes and the rest can
+    be served from the provider's prompt cache. History that does not fit the
+    speaker's context window is left out.
 
-    last_messages = history.get_last_messages(current_llm.name, opponent_llm.name)
-    opponent_last_message = last_messages[1][1].content if last_messages[1][1] else ""
-    current_llm_last_msg = last_messages[0][1].content if last_messages[0][1] else ""
+    Returns:
+        The prompt messages and their token budget breakdown.
+    """
+    current_llm = session.current_llm
+    opponent_llm = session.opponent_llm
+    turn_count = session.turn_count
+    question = session.questions[0] if session.questions else ""
+    max_words = session.answer_length
 
-    return DEBATE_PROMPT_TEMPLATE.format(
-        initial_question=question,
+    opening = DEBATE_OPENING_TEMPLATE.format(
+        current_llm_name=current_llm.name,
+        opponent_llm_name=opponent_llm.name,
+        initial_question=question
+    )
+    instructions = DEBATE_TURN_TEMPLATE.format(
         current_llm_name=current_llm.name,
         opponent_llm_name=opponent_llm.name,
         question_or_continuation=f"Question: {question}" if turn_count == 0 else "Continue the debate based on the previous messages.",
-        history=history.get_history(),
-        opponent_last_message=opponent_last_message,
-        current_llm_last_msg=current_llm_last_msg,
         max_words=max_words,
         address_or_continue="Address the current question with flair" if turn_count == 0 else "Continue the debate based on recent exchanges"
     )
 
-async def generate_debate_response(debate_db: Session, persona_db: Session):
-    current_llm = debate_state["current_llm"]
-    prompt = generate_prompt()
+    prompt, budget = fit_prompt(
+        current_llm,
+        session.history,
+        head=[{"role": "user", "content": opening}],
+        tail=[{"role": "user", "content": instructions}],
+    )
+    logger.info(f"Prompt budget for turn {turn_count} of debate {session.debate_id}: {budget.to_dict()}")
+    return prompt, budget
+
+def persist_summaries(session: DebateSession, debate_db: Session) -> None:
+    """
+    Add the session's new summaries to the database session, so a restarted
+    backend can rebuild the history without summarizing again.
+    """
+    for first_turn, turn_number, summary in session.pending_summaries:
+        debate_db.add(DebateSummary(
+            debate_id=session.debate_id,
+            content=summary.content,
+            first_turn=first_turn,
+            turn_number=turn_number,
+            created_at=summary.timestamp
+        ))
+    session.pending_summaries.clear()
+
+async def get_session(debate_id: int) -> DebateSession:
+    session = await get_session_manager().load(debate_id)
+    if session is None:
+        logger.error(f"No active session for debate {debate_id}")
+        raise HTTPException(status_code=404, detail="Debate not found or expired. Call /start_debate first.")
+    return session
+
+async def generate_debate_response(
+    session: DebateSession,
+    debate_db: Session,
+    persona_db: Session,
+    deadline: Optional[Deadline] = None
+):
+    """
+    Stream the next turn of a debate and persist it once complete.
+
+    The caller must hold session.lock for the whole iteration. Raises
+    SessionConflictError, without persisting the turn, if another worker
+    completed this turn first, and PersonaUnavailableError if the speaker's
+    persona is not ready.
+    """
+    current_llm = session.current_llm
+    await session.wait_for_persona(current_llm, deadline)
+    prompt, _ = generate_prompt(session)
 
     full_response = ""
-    async for chunk in current_llm(prompt):
-        full_response += chunk
-        yield {"name": current_llm.name, "chunk": chunk}
+    stream = current_llm(prompt, deadline=deadline)
+    try:
+        async for chunk in stream:
+            full_response += chunk
+            yield {"name": current_llm.name, "chunk": chunk}
+    except (asyncio.CancelledError, GeneratorExit):
+        # The consumer went away mid-turn: stop the provider stream, keep the
+        # partial text as an aborted turn and leave the turn to the same speaker
+        await stream.aclose()
+        debate_db.add(DebateTurn(
+            debate_id=session.debate_id,
+            speaker=current_llm.name,
+            content=full_response,
+            prompt=json.dumps(prompt),
+            turn_number=session.turn_count,
+            status="aborted"
+        ))
+        debate_db.commit()
+        logger.info(f"Aborted turn {session.turn_count} of {current_llm.name} after {len(full_response)} characters")
+        raise
 
-    await debate_state["history"].add_message(full_response, current_llm.name)
+    logger.info(f"{current_llm.name} usage: {current_llm.last_usage}")
+    turn_count = session.turn_count
+    await session.history.add_message(full_response, current_llm.name)
+    session.advance()
+    await get_session_manager().save(session)
 
     new_turn = DebateTurn(
-        debate_id=debate_state["current_debate_id"],
+        debate_id=session.debate_id,
         speaker=current_llm.name,
         content=full_response,
-        prompt=prompt,
-        turn_number=debate_state["turn_count"]
+        prompt=json.dumps(prompt),
+        turn_number=turn_count
     )
     debate_db.add(new_turn)
+    persist_summaries(session, debate_db)
     debate_db.commit()
 
-    debate_state["current_llm"], debate_state["opponent_llm"] = debate_state["opponent_llm"], debate_state["current_llm"]
-    debate_state["turn_count"] += 1
-
 
 @router.post("/start_debate", response_model=DebateResponse)
 async def start_debate(request: DebateRequest):
@@ -90,68 +152,62 @@ async def start_debate(request: DebateRequest):
     persona_db = next(get_persona_db())
     
     try:
-        logger.debug("About to call generate_debate_personas")
-        logger.debug(f"Arguments: debate_topic={request.topic}, name1={request.name1}, name2={request.name2}, persona_db={persona_db}, answer_length={request.answer_length}, provider={request.provider}")
-        
-        debate_state["personas"] = await generate_debate_personas(
-            debate_topic=request.topic,
-            name1=request.name1,
-            name2=request.name2,
-            persona_db=persona_db,
-            answer_length=request.answer_length,
-            provider=request.provider
-        )
-        
-        logger.debug("generate_debate_personas completed successfully")
-        
-        # Create LLMs using the generated personas
-        debate_state["llm1"] = AsyncLLM(
-            provider=request.provider,
-            name=debate_state["personas"][0]["name"],
-            stream=True,
-            max_tokens=request.answer_length * 3,
-            temperature=0.7,
-            system_prompt=debate_state["personas"][0]["system_prompt"]
-        )
-
-        debate_state["llm2"] = AsyncLLM(
-            provider=request.provider,
-            name=debate_state["personas"][1]["name"],
-            stream=True,
-            max_tokens=request.answer_length * 3,
-            temperature=0.7,
-            system_prompt=debate_state["personas"][1]["system_prompt"]
-        )
-        
-        summarizer = AsyncLLM(request.provider, name="summarizer")
-        debate_state["history"] = ConversationHistory(summarizer)
-        
-        debate_state["current_llm"], debate_state["opponent_llm"] = debate_state["llm1"], debate_state["llm2"]
-        debate_state["turn_count"] = 0
-        debate_state["questions"] = request.questions
-        debate_state["answer_length"] = request.answer_length
+        # Personas are stored under the sorted names
+        name1, name2 = sorted([request.name1, request.name2])
+        key = (request.topic, name1, name2, request.answer_length, request.provider)
+        personas = lookup_personas(persona_db, key) or await find_similar_personas(persona_db, key)
+        pending = None
+        if personas is None:
+            # End the read transaction so the pooled connection is not held while the LLM generates
+            persona_db.commit()
+            # Concurrent requests for the same pair share one generation. Start the
+            # debate as soon as the first speaker's persona is ready; the second
+            # one completes in the background
+            generation = get_persona_flights().generate(key, request.persona_mode)
+            first = await asyncio.shield(generation.first)
+            if generation.done.done():
+                personas = generation.done.result()
+            else:
+                pending = generation
+                personas = (first, {"name": name2, "system_prompt": None})
+                logger.debug("First persona generated, the second one continues in the background")
 
         new_debate = Debate(
             topic=request.topic,
             name1=request.name1,
             name2=request.name2,
             provider=request.provider,
+            fallback_provider=request.fallback_provider,
+            summarizer=request.summarizer,
             questions=json.dumps(request.questions),
             answer_length=request.answer_length,
             persona1=json.dumps({
-                "name": debate_state["personas"][0]["name"],
-                "system_prompt": debate_state["personas"][0]["system_prompt"]
+                "name": personas[0]["name"],
+                "system_prompt": personas[0]["system_prompt"]
             }),
+            # NULL while the second persona is being generated
             persona2=json.dumps({
-                "name": debate_state["personas"][1]["name"],
-                "system_prompt": debate_state["personas"][1]["system_prompt"]
-            })
+                "name": personas[1]["name"],
+                "system_prompt": personas[1]["system_prompt"]
+            }) if pending is None else None
         )
         debate_db.add(new_debate)
         debate_db.commit()
         debate_db.refresh(new_debate)
         
-        debate_state["current_debate_id"] = new_debate.id
+        session = DebateSession.create(
+            debate_id=new_debate.id,
+            personas=personas,
+            provider=request.provider,
+            questions=request.questions,
+            answer_length=request.answer_length,
+            fallback_provider=request.fallback_provider,
+            summarizer=request.summarizer
+        )
+        if pending is not None:
+            session.start_persona_task(pending)
+        await get_session_manager().save(session)
+        get_session_manager().add(session)
 
         return DebateResponse(message="Debate initialized. Connect to WebSocket or use /one_turn_debate to progress.", debate_id=new_debate.id)
     except Exception as e:
@@ -166,50 +222,72 @@ async def start_debate(request: DebateRequest):
 
 @router.post("/one_turn_debate", response_model=OneTurnDebateResponse)
 async def one_turn_debate(
+    debate_id: int,
     debate_db: Session = Depends(get_debate_db),
     persona_db: Session = Depends(get_persona_db)
 ):
-    logger.info("Received request for one_turn_debate")
+    logger.info(f"Received request for one_turn_debate of debate {debate_id}")
     
-    if not debate_state["current_llm"]:
-        logger.error("Debate not initialized")
-        raise HTTPException(status_code=400, detail="Debate not initialized. Call /start_debate first.")
+    session = await get_session(debate_id)
 
-    current_llm = debate_state["current_llm"]
-    turn_count = debate_state["turn_count"]
+    # Turns of one debate run one at a time; concurrent requests queue here
+    async with session.lock:
+        current_llm = session.current_llm
+        turn_count = session.turn_count
 
-    logger.info(f"Current turn count: {turn_count}")
-    logger.info(f"Current speaker: {current_llm.name}")
+        logger.info(f"Current turn count: {turn_count}")
+        logger.info(f"Current speaker: {current_llm.name}")
 
-    prompt = generate_prompt()
-    logger.info(f"Generated prompt: {prompt}")
+        deadline = Deadline.from_env("ONE_TURN")
+        try:
+            await session.wait_for_persona(current_llm, deadline)
+        except PersonaUnavailableError as e:
+            logger.error(f"Persona of {current_llm.name} unavailable: {str(e)}")
+            raise HTTPException(status_code=503, detail=str(e))
 
-    full_response = ""
-    async for chunk in current_llm(prompt):
-        full_response += chunk
+        prompt, budget = generate_prompt(session)
+        logger.info(f"Generated prompt: {prompt}")
 
-    logger.info(f"Generated response: {full_response}")
+        full_response = ""
+        try:
+            async for chunk in current_llm(prompt, deadline=deadline):
+                full_response += chunk
+        except LLMTimeoutError as e:
+            logger.error(f"LLM call timed out for {current_llm.name} ({e.phase}): {str(e)}")
+            raise HTTPException(status_code=504, detail=str(e))
+        except LLMError as e:
+            # Nothing is persisted, so the same speaker can retry this turn
+            logger.error(f"LLM call failed for {current_llm.name}: {str(e)}")
+            raise HTTPException(status_code=502, detail=str(e))
 
-    await debate_state["history"].add_message(full_response, current_llm.name)
+        logger.info(f"Generated response: {full_response}")
+        logger.info(f"Token usage: {current_llm.last_usage}")
 
-    new_turn = DebateTurn(
-        debate_id=debate_state["current_debate_id"],
-        speaker=current_llm.name,
-        content=full_response,
-        prompt=prompt,
-        turn_number=turn_count
-    )
-    debate_db.add(new_turn)
-    debate_db.commit()
+        await session.history.add_message(full_response, current_llm.name)
+        session.advance()
+        try:
+            await get_session_manager().save(session)
+        except SessionConflictError as e:
+            # Another worker completed this turn first; its turn stands
+            logger.warning(f"Discarding turn {turn_count} of debate {debate_id}: {str(e)}")
+            raise HTTPException(status_code=409, detail="The debate advanced concurrently. Request the next turn again.")
 
-    logger.info(f"Saved turn to database: turn_number={turn_count}, speaker={current_llm.name}")
+        new_turn = DebateTurn(
+            debate_id=debate_id,
+            speaker=current_llm.name,
+            content=full_response,
+            prompt=json.dumps(prompt),
+            turn_number=turn_count
+        )
+        debate_db.add(new_turn)
+        persist_summaries(session, debate_db)
+        debate_db.commit()
 
-    debate_state["current_llm"], debate_state["opponent_llm"] = debate_state["opponent_llm"], debate_state["current_llm"]
-    debate_state["turn_count"] += 1
+        logger.info(f"Saved turn to database: turn_number={turn_count}, speaker={current_llm.name}")
 
-    logger.info(f"Updated debate state: turn_count={debate_state['turn_count']}, next_speaker={debate_state['current_llm'].name}")
+        logger.info(f"Updated debate state: turn_count={session.turn_count}, next_speaker={session.current_llm.name}")
 
-    return OneTurnDebateResponse(name=current_llm.name, response=full_response)
+    return OneTurnDebateResponse(name=current_llm.name, response=full_response, budget=budget.to_dict())
 
 @router.get("/debate/{debate_id}", response_model=DebateSchema)
 async def get_debate(debate_id: int, db: Session = Depends(get_debate_db)):
@@ -234,6 +312,7 @@ async def get_debate(debate_id: int, db: Session = Depends(get_debate_db)):
                 "speaker": turn.speaker,
                 "content": turn.content,
                 "prompt": turn.prompt,
+                "status": turn.status,
                 "created_at": turn.created_at
             }
             for turn in turns
@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from app.personas import get_persona_cache, get_persona_flights, get_similar_topics
+from app.sessions import get_session_manager
+from LLM.cache import get_default_cache
+from LLM.hedging import hedge_stats
+from LLM.metrics import memory_sink
+from LLM.rate_limit import rate_limiter_stats
+
+router = APIRouter(prefix="/stats")
+
+@router.get("/rate_limits")
+async def get_rate_limits():
+    return rate_limiter_stats()
+
+@router.get("/hedging")
+async def get_hedging():
+    return hedge_stats()
+
+@router.get("/cache")
+async def get_cache():
+    return get_default_cache().stats()
+
+@router.get("/llm_calls")
+async def get_llm_calls(limit: int = 50):
+    return {"summary": memory_sink.summary(), "recent": memory_sink.recent(limit)}
+
+
+@router.get("/sessions")
+async def get_sessions():
+    return get_session_manager().stats()
+
+
+@router.get("/personas")
+async def get_personas():
+    return {
+        "cache": get_persona_cache().stats(),
+        "generations": get_persona_flights().stats(),
+        "similar_topics": get_similar_topics().stats(),
+    }
@@ -1,27 +1,97 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from sqlalchemy.orm import Session
 from app.database import get_debate_db, get_persona_db
-from .debate import debate_state, generate_debate_response
+from app.sessions import DebateSession, PersonaUnavailableError, SessionConflictError, get_session_manager
+from .debate import generate_debate_response
+from LLM.deadlines import Deadline
+from LLM.errors import LLMError, LLMTimeoutError
+import asyncio
 import logging
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+
+async def _read_requests(websocket: WebSocket, requests: asyncio.Queue, disconnected: asyncio.Event):
+    """
+    Forward client messages to the request queue until the client disconnects.
+
+    Reading runs concurrently with turn generation so a disconnect is noticed
+    while a turn is still streaming, not only at the next send.
+    """
+    try:
+        while True:
+            requests.put_nowait(await websocket.receive_text())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        disconnected.set()
+        requests.put_nowait(None)
+
+
+async def _stream_turn(websocket: WebSocket, session: DebateSession, debate_db: Session, persona_db: Session):
+    async with session.lock:
+        turn = generate_debate_response(session, debate_db, persona_db, deadline=Deadline.from_env("WS"))
+        try:
+            async for response_chunk in turn:
+                await websocket.send_json(response_chunk)
+        except LLMTimeoutError as e:
+            logger.error(f"LLM call timed out ({e.phase}): {str(e)}")
+            await websocket.send_json({"error": str(e), "timeout": e.phase})
+        except LLMError as e:
+            # The turn was not persisted; the client may ask for it again
+            logger.error(f"LLM call failed: {str(e)}")
+            await websocket.send_json({"error": str(e)})
+        except PersonaUnavailableError as e:
+            # The speaker's persona is still being generated (or failed); nothing was persisted
+            logger.error(f"Persona unavailable in debate {session.debate_id}: {str(e)}")
+            await websocket.send_json({"error": str(e)})
+        except SessionConflictError as e:
+            # Another worker completed this turn first; its turn stands
+            logger.warning(f"Discarding turn of debate {session.debate_id}: {str(e)}")
+            await websocket.send_json({"error": "The debate advanced concurrently. Request the next turn again."})
+        finally:
+            # Closing the generator cancels the upstream provider stream when the
+            # turn is interrupted
+            await turn.aclose()
+    await websocket.send_text("<END_WEBSOCKET_TOKEN>")
+
+
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket, 
+    debate_id: int,
     debate_db: Session = Depends(get_debate_db),
     persona_db: Session = Depends(get_persona_db)
 ):
     await websocket.accept()
+    requests: asyncio.Queue = asyncio.Queue()
+    disconnected = asyncio.Event()
+    reader = asyncio.create_task(_read_requests(websocket, requests, disconnected))
     try:
         while True:
             # Wait for a signal from the client to generate the next turn
-            await websocket.receive_text()
-            
-            async for response_chunk in generate_debate_response(debate_db, persona_db):
-                await websocket.send_json(response_chunk)
-            await websocket.send_text("<END_WEBSOCKET_TOKEN>")
-    except WebSocketDisconnect:
-        logger.info("WebSocket disconnected")
\ No newline at end of file
+            if await requests.get() is None:
+                break
+
+            session = await get_session_manager().load(debate_id)
+            if session is None:
+                await websocket.send_json({"error": f"Debate {debate_id} not found or expired. Call /start_debate first."})
+                await websocket.send_text("<END_WEBSOCKET_TOKEN>")
+                continue
+
+            turn = asyncio.create_task(_stream_turn(websocket, session, debate_db, persona_db))
+            disconnect = asyncio.create_task(disconnected.wait())
+            await asyncio.wait({turn, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            disconnect.cancel()
+            if not turn.done():
+                logger.info("WebSocket disconnected mid-turn, cancelling the LLM stream")
+                turn.cancel()
+            try:
+                await turn
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                break
+    finally:
+        reader.cancel()
+        logger.info("WebSocket disconnected")
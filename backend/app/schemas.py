@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class PersonaInfo(BaseModel):
@@ -17,12 +17,18 @@ class DebateRequest(BaseModel):
     provider: str = "openai"
     questions: List[str]
     answer_length: int = 150
+    fallback_provider: Optional[str] = None
+    # "extractive" compacts old turns locally instead of with an LLM call
+    summarizer: Literal["llm", "extractive"] = "llm"
+    # "concurrent" generates the two personas in parallel calls
+    persona_mode: Literal["combined", "concurrent"] = "combined"
 
 class TurnSchema(BaseModel):
     turn_number: int
     speaker: str
     content: str
     prompt: str
+    status: str = "completed"
     created_at: datetime
 
 class DebateSchema(BaseModel):
@@ -43,6 +49,8 @@ class DebateResponse(BaseModel):
 class OneTurnDebateResponse(BaseModel):
     name: str
     response: str
+    # Token breakdown of the turn's prompt
+    budget: Optional[dict] = None
 
 class DebateHistoryItem(BaseModel):
     id: int
@@ -0,0 +1,247 @@
+"""
+This module stores serialized debate sessions outside the process, so any
+uvicorn worker can run the next turn of any debate. Writes use optimistic
+concurrency: a save only succeeds if nobody advanced the debate in between.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import DebateSessionLocal
+from app.models import DebateSessionState
+
+
+class SessionConflictError(Exception):
+    """Raised when a session was saved by someone else since it was loaded."""
+
+
+@dataclass
+class SessionSnapshot:
+    """
+    The serializable state of a debate session.
+
+    Attributes:
+        debate_id: The id of the Debate row.
+        version: Number of saves so far; 0 for a session never saved.
+        turn_count: Number of completed turns.
+        current_speaker: Index in personas of the persona speaking next.
+        questions: The debate questions.
+        answer_length: Maximum number of words per answer.
+        provider: The LLM provider of the personas.
+        fallback_provider: The provider to fail over to, if any.
+        summarizer: The summarization strategy, "llm" or "extractive".
+        personas: The two personas as {"name", "system_prompt"} dicts, in
+            speaking order.
+        messages: The conversation history as {"content", "timestamp",
+            "sender", "is_summary", "token_count", "covers"} dicts.
+    """
+
+    debate_id: int
+    version: int
+    turn_count: int
+    current_speaker: int
+    questions: List[str]
+    answer_length: int
+    provider: str
+    fallback_provider: Optional[str] = None
+    summarizer: str = "llm"
+    personas: List[Dict[str, str]] = field(default_factory=list)
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        """
+        Serialize the snapshot, without its version.
+        """
+        data = asdict(self)
+        del data["version"]
+        return json.dumps(data, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str, version: int) -> "SessionSnapshot":
+        """
+        Deserialize a snapshot stored with to_json().
+
+        Args:
+            data: The JSON document.
+            version: The stored version.
+        """
+        return cls(version=version, **json.loads(data))
+
+
+class SessionStore:
+    """
+    Shared storage of session snapshots with compare-and-set writes.
+    """
+
+    async def load(self, debate_id: int) -> Optional[SessionSnapshot]:
+        """
+        Return the latest snapshot of a debate, or None if none was saved.
+        """
+        raise NotImplementedError
+
+    async def save(self, snapshot: SessionSnapshot) -> int:
+        """
+        Store a snapshot if the stored version still equals snapshot.version.
+
+        Args:
+            snapshot: The new state; its version is the one it was loaded at
+                (0 to create the session).
+
+        Returns:
+            The new version.
+
+        Raises:
+            SessionConflictError: If the stored version differs.
+        """
+        raise NotImplementedError
+
+    async def delete(self, debate_id: int) -> None:
+        """
+        Remove the snapshot of a debate, if any.
+        """
+        raise NotImplementedError
+
+
+class DatabaseSessionStore(SessionStore):
+    """
+    Keeps snapshots in the debate_sessions table of the debate database.
+    """
+
+    async def load(self, debate_id: int) -> Optional[SessionSnapshot]:
+        return await asyncio.to_thread(self._load, debate_id)
+
+    async def save(self, snapshot: SessionSnapshot) -> int:
+        return await asyncio.to_thread(self._save, snapshot)
+
+    async def delete(self, debate_id: int) -> None:
+        await asyncio.to_thread(self._delete, debate_id)
+
+    def _load(self, debate_id: int) -> Optional[SessionSnapshot]:
+        with DebateSessionLocal() as db:
+            row = db.get(DebateSessionState, debate_id)
+            if row is None:
+                return None
+            return SessionSnapshot.from_json(row.data, row.version)
+
+    def _save(self, snapshot: SessionSnapshot) -> int:
+        new_version = snapshot.version + 1
+        with DebateSessionLocal() as db:
+            if snapshot.version == 0:
+                db.add(DebateSessionState(debate_id=snapshot.debate_id, version=new_version, data=snapshot.to_json()))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    raise SessionConflictError(f"Session {snapshot.debate_id} already exists")
+                return new_version
+
+            result = db.execute(
+                update(DebateSessionState)
+                .where(DebateSessionState.debate_id == snapshot.debate_id)
+                .where(DebateSessionState.version == snapshot.version)
+                .values(version=new_version, data=snapshot.to_json())
+            )
+            db.commit()
+            if result.rowcount != 1:
+                raise SessionConflictError(
+                    f"Session {snapshot.debate_id} changed since version {snapshot.version}"
+                )
+            return new_version
+
+    def _delete(self, debate_id: int) -> None:
+        with DebateSessionLocal() as db:
+            db.query(DebateSessionState).filter(DebateSessionState.debate_id == debate_id).delete()
+            db.commit()
+
+
+# Sets version and data only if the stored version matches ARGV[1] ("" for a new key)
+_REDIS_CAS_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version') or ''
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', ARGV[2], 'data', ARGV[3])
+if tonumber(ARGV[4]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Keeps snapshots in Redis hashes; requires the optional redis package.
+    """
+
+    def __init__(self, url: str, ttl: int = 7 * 24 * 3600, prefix: str = "debate_session:"):
+        """
+        Initialize the RedisSessionStore.
+
+        Args:
+            url: The Redis URL, e.g. redis://localhost:6379/0.
+            ttl: Seconds a snapshot is kept after its last save; 0 keeps it forever.
+            prefix: Key prefix of the snapshots.
+
+        Raises:
+            ImportError: If the redis package is not installed.
+        """
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError("RedisSessionStore requires the redis package: pip install redis") from e
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._cas = self._redis.register_script(_REDIS_CAS_SCRIPT)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def load(self, debate_id: int) -> Optional[SessionSnapshot]:
+        stored = await self._redis.hgetall(self._key(debate_id))
+        if not stored:
+            return None
+        return SessionSnapshot.from_json(stored["data"], int(stored["version"]))
+
+    async def save(self, snapshot: SessionSnapshot) -> int:
+        new_version = snapshot.version + 1
+        expected = str(snapshot.version) if snapshot.version else ""
+        saved = await self._cas(
+            keys=[self._key(snapshot.debate_id)],
+            args=[expected, new_version, snapshot.to_json(), self.ttl],
+        )
+        if not saved:
+            raise SessionConflictError(
+                f"Session {snapshot.debate_id} changed since version {snapshot.version}"
+            )
+        return new_version
+
+    async def delete(self, debate_id: int) -> None:
+        await self._redis.delete(self._key(debate_id))
+
+    def _key(self, debate_id: int) -> str:
+        return f"{self.prefix}{debate_id}"
+
+
+def create_session_store() -> Optional[SessionStore]:
+    """
+    Build the store selected by DEBATE_SESSION_STORE.
+
+    Returns:
+        A DatabaseSessionStore for "database" (the default), a RedisSessionStore
+        for "redis", or None for "memory", which keeps sessions in this process
+        only and therefore supports a single worker.
+    """
+    backend = os.getenv("DEBATE_SESSION_STORE", "database")
+    if backend == "memory":
+        return None
+    if backend == "database":
+        return DatabaseSessionStore()
+    if backend == "redis":
+        return RedisSessionStore(
+            os.getenv("DEBATE_SESSION_REDIS_URL", "redis://localhost:6379/0"),
+            ttl=int(os.getenv("DEBATE_SESSION_REDIS_TTL", 7 * 24 * 3600)),
+        )
+    raise ValueError("DEBATE_SESSION_STORE must be 'database', 'redis' or 'memory'.")
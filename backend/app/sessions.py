@@ -0,0 +1,694 @@
+"""
+This module keeps the state of running debates, keyed by debate id, so one
+process can serve many debates at once. With a shared SessionStore, the
+in-memory sessions are a cache and any worker can run the next turn.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.database import DebateSessionLocal
+from app.models import Debate, DebateSummary, DebateTurn
+from app.personas import PersonaGeneration, PersonaKey, get_persona_flights
+from app.session_store import SessionConflictError, SessionSnapshot, SessionStore, create_session_store
+from LLM.base import AsyncLLM
+from LLM.cache import get_default_cache
+from LLM.deadlines import Deadline
+from LLM.ConversationHandler import ConversationHistory, Message
+from LLM.budget import input_budget
+from LLM.summarizers import create_summarizer
+from LLM.tokens import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+class PersonaUnavailableError(Exception):
+    """
+    Raised when a speaker's persona, generated in the background after
+    start_debate returned, failed or is not ready in time.
+    """
+
+
+class DebateSession:
+    """
+    The live state of one debate.
+
+    Turns of the same debate must not overlap, so callers hold the session
+    lock while generating a turn.
+    """
+
+    def __init__(
+        self,
+        debate_id: int,
+        llm1: AsyncLLM,
+        llm2: AsyncLLM,
+        history: ConversationHistory,
+        questions: List[str],
+        answer_length: int,
+        personas: Optional[List[Dict[str, str]]] = None,
+        summarizer: str = "llm",
+    ):
+        """
+        Initialize the DebateSession.
+
+        Args:
+            debate_id: The id of the Debate row.
+            llm1: The LLM speaking first.
+            llm2: The LLM speaking second.
+            history: The conversation history shared by both LLMs.
+            questions: The debate questions.
+            answer_length: Maximum number of words per answer.
+            personas: The generated personas.
+            summarizer: The name of the history's summarization strategy.
+        """
+        self.debate_id = debate_id
+        self.llm1 = llm1
+        self.llm2 = llm2
+        self.history = history
+        self.questions = questions
+        self.answer_length = answer_length
+        self.personas = personas
+        self.summarizer = summarizer
+        self.current_llm = llm1
+        self.opponent_llm = llm2
+        self.turn_count = 0
+        self.version = 0
+        self.lock = asyncio.Lock()
+        self.last_access = time.monotonic()
+        # Summaries not yet written to the database, with the last turn they cover
+        self.pending_summaries: List[Tuple[int, int, Message]] = []
+        # Completes the second persona when start_debate returned after the first
+        self.persona_task: Optional[asyncio.Task] = None
+        self.history.on_summary = self._collect_summary
+
+    @classmethod
+    def create(
+        cls,
+        debate_id: int,
+        personas: List[Dict[str, str]],
+        provider: str,
+        questions: List[str],
+        answer_length: int,
+        fallback_provider: Optional[str] = None,
+        summarizer: str = "llm",
+    ) -> "DebateSession":
+        """
+        Build a session and its LLMs from the personas of a debate.
+
+        Args:
+            debate_id: The id of the Debate row.
+            personas: The two personas as {"name", "system_prompt"} dicts; a
+                None system_prompt marks a persona still being generated.
+            provider: The LLM provider to use.
+            questions: The debate questions.
+            answer_length: Maximum number of words per answer.
+            fallback_provider: Provider to fail over to, if any.
+            summarizer: How old turns are compacted, "llm" or "extractive".
+
+        Returns:
+            A session at turn 0.
+        """
+        llm1, llm2 = (
+            AsyncLLM(
+                provider=provider,
+                name=persona["name"],
+                stream=True,
+                max_tokens=answer_length * 3,
+                temperature=0.7,
+                system_prompt=persona["system_prompt"],
+                fallback_provider=fallback_provider,
+                debate_id=debate_id
+            )
+            for persona in personas
+        )
+        # Token count above which the history is summarized
+        history_limit = int(os.getenv("DEBATE_HISTORY_MAX_TOKENS", 2000))
+        summarizer_llm = None
+        if summarizer == "llm":
+            summarizer_llm = AsyncLLM(
+                provider,
+                name="summarizer",
+                fallback_provider=fallback_provider,
+                cache=get_default_cache(),
+                debate_id=debate_id
+            )
+        return cls(
+            debate_id=debate_id,
+            llm1=llm1,
+            llm2=llm2,
+            history=ConversationHistory(
+                create_summarizer(summarizer, summarizer_llm),
+                # Summarize well before the history could crowd the model's window
+                max_token_length=min(history_limit, input_budget(llm1) // 2),
+                token_counter=get_token_counter(llm1.provider, llm1.model),
+            ),
+            questions=questions,
+            answer_length=answer_length,
+            personas=personas,
+            summarizer=summarizer,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: SessionSnapshot) -> "DebateSession":
+        """
+        Rebuild a session from its stored snapshot.
+
+        Args:
+            snapshot: The snapshot, as loaded from a SessionStore.
+
+        Returns:
+            The session, at the snapshot's turn and version.
+        """
+        session = cls.create(
+            debate_id=snapshot.debate_id,
+            personas=snapshot.personas,
+            provider=snapshot.provider,
+            questions=snapshot.questions,
+            answer_length=snapshot.answer_length,
+            fallback_provider=snapshot.fallback_provider,
+            summarizer=snapshot.summarizer,
+        )
+        session.history.set_messages([
+            Message(
+                content=msg["content"],
+                timestamp=datetime.fromisoformat(msg["timestamp"]),
+                sender=msg["sender"],
+                is_summary=msg["is_summary"],
+                # Snapshots written before token counts were cached lack them
+                token_count=msg.get("token_count"),
+                covers=msg.get("covers", 0),
+            )
+            for msg in snapshot.messages
+        ])
+        if snapshot.current_speaker == 1:
+            session.current_llm, session.opponent_llm = session.llm2, session.llm1
+        session.turn_count = snapshot.turn_count
+        session.version = snapshot.version
+        return session
+
+    @classmethod
+    def from_database(cls, debate_id: int) -> Optional["DebateSession"]:
+        """
+        Rebuild a session from the debate's rows, without calling any LLM.
+
+        The personas come from the Debate row and the history from the
+        persisted summaries still in use followed by the completed turns they
+        do not cover. A second persona still being generated (a NULL persona2)
+        is left pending, see wait_for_persona.
+        Blocking; run it in a thread from async code.
+
+        Args:
+            debate_id: The debate id.
+
+        Returns:
+            The session, at version 0, or None if the debate does not exist.
+        """
+        with DebateSessionLocal() as db:
+            debate = db.get(Debate, debate_id)
+            if debate is None or not debate.persona1:
+                return None
+            rows = (
+                db.query(DebateSummary)
+                .filter(DebateSummary.debate_id == debate_id)
+                .order_by(DebateSummary.turn_number, DebateSummary.id)
+                .all()
+            )
+            # (first turn, row) of the summaries in use: a merged summary
+            # replaces the earlier ones whose turns it covers
+            summaries: List[Tuple[int, DebateSummary]] = []
+            previous = -1
+            for row in rows:
+                first_turn = row.first_turn if row.first_turn is not None else previous + 1
+                previous = row.turn_number
+                while summaries and summaries[-1][0] >= first_turn:
+                    summaries.pop()
+                summaries.append((first_turn, row))
+            covered = rows[-1].turn_number if rows else -1
+            completed = (DebateTurn.debate_id == debate_id, DebateTurn.status == "completed")
+            # Turns covered by a summary are not part of the history any more
+            turns = (
+                db.query(DebateTurn)
+                .filter(*completed, DebateTurn.turn_number > covered)
+                .order_by(DebateTurn.turn_number, DebateTurn.id)
+                .all()
+            )
+            last_turn = db.query(func.max(DebateTurn.turn_number)).filter(*completed).scalar()
+
+            session = cls.create(
+                debate_id=debate_id,
+                personas=[json.loads(debate.persona1), cls._load_persona2(debate)],
+                provider=debate.provider,
+                questions=json.loads(debate.questions),
+                answer_length=debate.answer_length,
+                fallback_provider=debate.fallback_provider,
+                summarizer=debate.summarizer or "llm",
+            )
+            session.history.set_messages([
+                Message(
+                    summary.content,
+                    summary.created_at,
+                    "Summary",
+                    is_summary=True,
+                    covers=summary.turn_number - first_turn + 1,
+                )
+                for first_turn, summary in summaries
+            ] + [
+                Message(turn.content, turn.created_at, turn.speaker)
+                for turn in turns
+            ])
+            session.turn_count = last_turn + 1 if last_turn is not None else 0
+
+        # Speakers alternate, starting with the first persona
+        if session.turn_count % 2:
+            session.current_llm, session.opponent_llm = session.llm2, session.llm1
+        return session
+
+    @staticmethod
+    def _load_persona2(debate: Debate) -> Dict[str, Optional[str]]:
+        if debate.persona2:
+            return json.loads(debate.persona2)
+        # Pending: named after the later of the sorted names, like the generated persona
+        return {"name": sorted([debate.name1, debate.name2])[1], "system_prompt": None}
+
+    def set_persona(self, index: int, persona: Dict[str, str]) -> Dict[str, str]:
+        """
+        Install a persona generated after the session was created.
+
+        The speaker keeps the name it was created with, since history
+        messages and prompts already refer to it.
+
+        Args:
+            index: 0 for llm1, 1 for llm2.
+            persona: The generated {"name", "system_prompt"} dict.
+
+        Returns:
+            The persona as installed.
+        """
+        llm = (self.llm1, self.llm2)[index]
+        if persona["name"] != llm.name:
+            logger.warning(f"Persona generated as {persona['name']!r} for {llm.name!r} in debate {self.debate_id}, keeping {llm.name!r}")
+        llm.system_prompt = persona["system_prompt"]
+        installed = {"name": llm.name, "system_prompt": llm.system_prompt}
+        if self.personas is not None:
+            self.personas = list(self.personas)
+            self.personas[index] = installed
+        return installed
+
+    async def wait_for_persona(self, llm: AsyncLLM, deadline: Optional[Deadline] = None) -> None:
+        """
+        Wait until the persona of llm is ready, if it is still being generated.
+
+        The persona comes from this session's persona_task. Without a running
+        task (the session was rebuilt, another worker generated it, or the
+        generation failed), the Debate row is read and, if the persona is
+        still missing, the generation starts again; a worker generating the
+        same pair holds its lock, so this waits for that pair instead of
+        generating another one.
+
+        Args:
+            llm: llm1 or llm2.
+            deadline: Bounds the wait with its remaining total time, if set.
+
+        Raises:
+            PersonaUnavailableError: If generation failed or did not finish
+                before the deadline.
+        """
+        if llm.system_prompt is not None:
+            return
+        index = 0 if llm is self.llm1 else 1
+        if self.persona_task is None or self.persona_task.done():
+            persona = await asyncio.to_thread(self._read_persona, index)
+            if persona is not None:
+                self.set_persona(index, persona)
+                return
+            self.start_persona_task()
+
+        timeout = deadline.remaining() if deadline is not None else None
+        # Neither a cancelled turn nor a timeout cancels the task, and the task
+        # being cancelled (the session was discarded) does not cancel the turn
+        done, _ = await asyncio.wait({self.persona_task}, timeout=timeout)
+        if not done:
+            raise PersonaUnavailableError(f"The persona of {llm.name} is still being generated")
+        if llm.system_prompt is None:
+            # The next turn starts the generation again
+            raise PersonaUnavailableError(f"Generating the persona of {llm.name} failed")
+
+    def start_persona_task(self, generation: Optional[PersonaGeneration] = None) -> None:
+        """
+        Complete the pending second persona in the background.
+
+        Args:
+            generation: The generation producing it; when None, one is
+                started (or joined) for the Debate row's persona key.
+        """
+        self.persona_task = asyncio.create_task(self._complete_persona(generation))
+
+    async def _complete_persona(self, generation: Optional[PersonaGeneration]) -> None:
+        # Failures are logged; the waiting turn sees the persona missing
+        try:
+            if generation is None:
+                key = await asyncio.to_thread(self._persona_key)
+                generation = get_persona_flights().generate(key)
+            personas = await asyncio.shield(generation.done)
+            persona = self.set_persona(1, personas[1])
+            await asyncio.to_thread(self._store_persona2, persona)
+        except Exception:
+            logger.exception(f"Generating the second persona of debate {self.debate_id} failed")
+
+    def _persona_key(self) -> PersonaKey:
+        with DebateSessionLocal() as db:
+            debate = db.get(Debate, self.debate_id)
+            if debate is None:
+                raise ValueError(f"Debate {self.debate_id} does not exist")
+            name1, name2 = sorted([debate.name1, debate.name2])
+            return (debate.topic, name1, name2, debate.answer_length, debate.provider)
+
+    def _read_persona(self, index: int) -> Optional[Dict[str, str]]:
+        with DebateSessionLocal() as db:
+            debate = db.get(Debate, self.debate_id)
+            stored = (debate.persona1, debate.persona2)[index] if debate is not None else None
+            return json.loads(stored) if stored else None
+
+    def _store_persona2(self, persona: Dict[str, str]) -> None:
+        with DebateSessionLocal() as db:
+            debate = db.get(Debate, self.debate_id)
+            if debate is not None:
+                debate.persona2 = json.dumps(persona)
+                db.commit()
+
+    def to_snapshot(self) -> SessionSnapshot:
+        """
+        Capture the session's state, tagged with the version it was loaded at.
+        """
+        return SessionSnapshot(
+            debate_id=self.debate_id,
+            version=self.version,
+            turn_count=self.turn_count,
+            current_speaker=0 if self.current_llm is self.llm1 else 1,
+            questions=self.questions,
+            answer_length=self.answer_length,
+            provider=self.llm1.provider,
+            fallback_provider=self.llm1.fallback_provider,
+            summarizer=self.summarizer,
+            personas=[
+                {"name": llm.name, "system_prompt": llm.system_prompt}
+                for llm in (self.llm1, self.llm2)
+            ],
+            messages=[
+                {
+                    "content": msg.content,
+                    "timestamp": msg.timestamp.isoformat(),
+                    "sender": msg.sender,
+                    "is_summary": msg.is_summary,
+                    "token_count": msg.token_count,
+                    "covers": msg.covers,
+                }
+                for msg in self.history.messages
+            ],
+        )
+
+    async def _collect_summary(self, summary: Message, uncovered: int) -> None:
+        # Summaries finish in the background: of the turn_count turns so far, the
+        # last `uncovered` ones arrived while it was generated and are not in it.
+        # Written to the database together with the next completed turn
+        last_turn = self.turn_count - 1 - uncovered
+        self.pending_summaries.append((last_turn - summary.covers + 1, last_turn, summary))
+
+    def advance(self) -> None:
+        """
+        Hand the floor to the other LLM after a completed turn.
+        """
+        self.current_llm, self.opponent_llm = self.opponent_llm, self.current_llm
+        self.turn_count += 1
+
+    def touch(self) -> None:
+        """
+        Mark the session as used now.
+        """
+        self.last_access = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Cancel the session's background work once it is discarded: its
+        summarization and its wait for the second persona. A shared persona
+        generation keeps running for the other requests of its pair.
+        """
+        self.history.cancel_summary()
+        if self.persona_task is not None:
+            self.persona_task.cancel()
+
+    def approximate_size(self) -> int:
+        """
+        Return a rough size of the session's text in bytes, used for the memory
+        cap. Constant time: the history keeps a running character count.
+        """
+        return (
+            self.history.total_chars
+            + len(self.llm1.system_prompt or "")
+            + len(self.llm2.system_prompt or "")
+        )
+
+
+class SessionManager:
+    """
+    Holds the DebateSessions of a process.
+
+    Idle sessions expire after a TTL; beyond the session count or memory cap
+    the least recently used idle sessions are evicted. Sessions in the middle
+    of a turn are never evicted. The memory cap is checked against a running
+    total of the sessions' sizes, so checking it never walks the histories.
+    A session is measured whenever it is added, looked up or saved: its
+    history grows during turns, which start with a lookup and end with a
+    save, and a summary finishing in the background is counted at the next
+    one.
+
+    With a store, every completed turn is saved with compare-and-set, and a
+    session is rebuilt from the store whenever another worker saved a newer
+    version, so evicted sessions are not lost either.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl: Optional[float] = 3600.0,
+        max_bytes: Optional[int] = 200 * 1024 * 1024,
+        store: Optional[SessionStore] = None,
+    ):
+        """
+        Initialize the SessionManager.
+
+        Args:
+            max_sessions: Maximum number of sessions kept.
+            ttl: Seconds an idle session is kept; forever when None.
+            max_bytes: Cap on the approximate size of all sessions; unlimited
+                when None.
+            store: Shared store of session snapshots; sessions only live in
+                this process when None.
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.store = store
+        # Least recently used first
+        self._sessions: "OrderedDict[int, DebateSession]" = OrderedDict()
+        # Size of every session when last measured, and their sum
+        self._sizes: Dict[int, int] = {}
+        self._total_bytes = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionManager":
+        """
+        Build a manager from DEBATE_SESSION_* environment variables.
+
+        Returns:
+            A SessionManager with defaults for any variable that is not set.
+            A TTL or byte cap of 0 disables that limit.
+        """
+        defaults = cls()
+        ttl = float(os.getenv("DEBATE_SESSION_TTL", defaults.ttl))
+        max_bytes = int(os.getenv("DEBATE_SESSION_MAX_BYTES", defaults.max_bytes))
+        return cls(
+            max_sessions=int(os.getenv("DEBATE_SESSION_MAX", defaults.max_sessions)),
+            ttl=ttl or None,
+            max_bytes=max_bytes or None,
+            store=create_session_store(),
+        )
+
+    def add(self, session: DebateSession) -> None:
+        """
+        Register a new session, evicting others if limits are exceeded.
+
+        Args:
+            session: The session to add.
+        """
+        self._sessions[session.debate_id] = session
+        self._sessions.move_to_end(session.debate_id)
+        session.touch()
+        self._measure(session)
+        self.evict()
+
+    def get(self, debate_id: int) -> Optional[DebateSession]:
+        """
+        Look up the session of a debate and mark it as used.
+
+        Args:
+            debate_id: The debate id.
+
+        Returns:
+            The session, or None if it does not exist or has expired.
+        """
+        self.evict()
+        session = self._sessions.get(debate_id)
+        if session is None:
+            return None
+        session.touch()
+        self._sessions.move_to_end(debate_id)
+        self._measure(session)
+        return session
+
+    async def load(self, debate_id: int) -> Optional[DebateSession]:
+        """
+        Return the up-to-date session of a debate.
+
+        The local session is used as long as its version matches the store;
+        otherwise it is rebuilt from the stored snapshot. A debate that is in
+        neither, e.g. after a restart without a shared store, is rebuilt from
+        its database rows.
+
+        Args:
+            debate_id: The debate id.
+
+        Returns:
+            The session, or None if the debate does not exist.
+        """
+        session = self.get(debate_id)
+        snapshot = await self.store.load(debate_id) if self.store is not None else None
+        if snapshot is not None:
+            if session is None or session.version != snapshot.version:
+                logger.info(f"Loading debate session {debate_id} at version {snapshot.version} from the store")
+                # The stale session's background work would only update an orphaned history
+                self.remove(debate_id)
+                session = DebateSession.from_snapshot(snapshot)
+                self.add(session)
+            return session
+        if session is not None:
+            return session
+
+        start = time.perf_counter()
+        session = await asyncio.to_thread(DebateSession.from_database, debate_id)
+        if session is None:
+            return None
+        # Another request may have rebuilt it while this one was reading
+        if debate_id in self._sessions:
+            return self.get(debate_id)
+        logger.info(
+            f"Rebuilt debate session {debate_id} at turn {session.turn_count} "
+            f"from the database in {time.perf_counter() - start:.3f}s"
+        )
+        self.add(session)
+        return session
+
+    async def save(self, session: DebateSession) -> None:
+        """
+        Persist a session after it changed, e.g. after a completed turn.
+
+        Args:
+            session: The session; its version is bumped on success.
+
+        Raises:
+            SessionConflictError: If another worker saved the debate since this
+                session was loaded. The local session is dropped so the next
+                load picks up the stored state.
+        """
+        if self._sessions.get(session.debate_id) is session:
+            self._measure(session)
+        if self.store is None:
+            session.version += 1
+            return
+        try:
+            session.version = await self.store.save(session.to_snapshot())
+        except SessionConflictError:
+            self.remove(session.debate_id)
+            raise
+
+    def remove(self, debate_id: int) -> None:
+        """
+        Drop the session of a debate, if any.
+        """
+        session = self._sessions.pop(debate_id, None)
+        if session is not None:
+            self._total_bytes -= self._sizes.pop(debate_id, 0)
+            session.close()
+
+    def evict(self) -> None:
+        """
+        Drop expired sessions, then least recently used ones while over the limits.
+        """
+        # Sessions are kept in order of last use, so only the oldest are visited
+        if self.ttl is not None:
+            now = time.monotonic()
+            expired = []
+            for session in self._sessions.values():
+                if now - session.last_access <= self.ttl:
+                    break
+                if not session.lock.locked():
+                    expired.append(session)
+            for session in expired:
+                self._drop(session, "expired")
+
+        count, total_bytes = len(self._sessions), self._total_bytes
+        over_capacity = []
+        for session in self._sessions.values():
+            over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+            if count <= self.max_sessions and not over_bytes:
+                break
+            if not session.lock.locked():
+                over_capacity.append(session)
+                count -= 1
+                total_bytes -= self._sizes.get(session.debate_id, 0)
+        for session in over_capacity:
+            self._drop(session, "over capacity")
+
+    def stats(self) -> dict:
+        """
+        Return the number of sessions, their approximate size and evictions so far.
+        """
+        return {
+            "sessions": len(self._sessions),
+            "active": sum(session.lock.locked() for session in self._sessions.values()),
+            "approximate_bytes": self._total_bytes,
+            "evictions": self.evictions,
+        }
+
+    def _measure(self, session: DebateSession) -> None:
+        size = session.approximate_size()
+        self._total_bytes += size - self._sizes.get(session.debate_id, 0)
+        self._sizes[session.debate_id] = size
+
+    def _drop(self, session: DebateSession, reason: str) -> None:
+        del self._sessions[session.debate_id]
+        self._total_bytes -= self._sizes.pop(session.debate_id, 0)
+        session.close()
+        self.evictions += 1
+        logger.info(f"Evicted debate session {session.debate_id} ({reason})")
+
+
+_session_manager: Optional[SessionManager] = None
+
+
+def get_session_manager() -> SessionManager:
+    """
+    Return the process-wide session manager configured through the environment.
+    """
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager.from_env()
+    return _session_manager
@@ -1,5 +1,10 @@
 import React, { useState, useEffect, useRef } from "react";
-import { startDebate, oneTurnDebate, getPersonas } from "../utils/api";
+import {
+  startDebate,
+  oneTurnDebate,
+  getPersonas,
+  debateWebSocketUrl,
+} from "../utils/api";
 import DebateForm from "./DebateForm";
 
 const DebateController = ({
@@ -10,16 +15,21 @@ const DebateController = ({
 }) => {
   const [isLoading, setIsLoading] = useState(false);
   const [useWebSocket, setUseWebSocket] = useState(true);
+  const [debateId, setDebateId] = useState(null);
   const ws = useRef(null);
 
   useEffect(() => {
-    if (debateStarted && useWebSocket) {
-      ws.current = new WebSocket("ws://localhost:8000/ws");
+    if (debateStarted && useWebSocket && debateId !== null) {
+      ws.current = new WebSocket(debateWebSocketUrl(debateId));
       ws.current.onmessage = (event) => {
         if (event.data === "<END_WEBSOCKET_TOKEN>") {
           setIsLoading(false);
         } else {
           const data = JSON.parse(event.data);
+          if (data.error) {
+            console.error("Debate turn failed:", data.error);
+            return;
+          }
           setDebateResponses((prev) => {
             const lastResponse = prev[prev.length - 1];
             if (lastResponse && lastResponse.name === data.name) {
@@ -42,7 +52,7 @@ const DebateController = ({
         }
       };
     }
-  }, [debateStarted, useWebSocket, setDebateResponses]);
+  }, [debateStarted, useWebSocket, debateId, setDebateResponses]);
 
   const handleStartDebate = async (formData) => {
     setIsLoading(true);
@@ -54,8 +64,9 @@ const DebateController = ({
       provider: formData.provider,
       answer_length: formData.answer_length,
     };
-    const success = await startDebate(debateData);
-    if (success) {
+    const newDebateId = await startDebate(debateData);
+    if (newDebateId !== null) {
+      setDebateId(newDebateId);
       setDebateStarted(true);
     }
     setIsLoading(false);
@@ -66,7 +77,7 @@ const DebateController = ({
     if (useWebSocket && ws.current) {
       ws.current.send("next");
     } else {
-      const response = await oneTurnDebate();
+      const response = await oneTurnDebate(debateId);
       if (response) {
         setDebateResponses((prev) => [...prev, response]);
       }
@@ -110,6 +110,7 @@ const DebateForm = ({ onSubmit }) => {
         >
           <option value="openai">OpenAI</option>
           <option value="claude">Claude</option>
+          <option value="mock">Mock (offline)</option>
         </select>
       </div>
       <div>
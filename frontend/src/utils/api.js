@@ -20,11 +20,15 @@ export const testEndpoint = async (endpoint, method = 'get', data = null) => {
 
 export const startDebate = async (debateData) => {
     const response = await testEndpoint('/start_debate', 'post', debateData);
-    return response && response.message.includes("Debate initialized");
+    return response && response.message.includes("Debate initialized") ? response.debate_id : null;
 };
 
-export const oneTurnDebate = async () => {
-    return await testEndpoint('/one_turn_debate', 'post');
+export const oneTurnDebate = async (debateId) => {
+    return await testEndpoint(`/one_turn_debate?debate_id=${debateId}`, 'post');
+};
+
+export const debateWebSocketUrl = (debateId) => {
+    return `${API_URL.replace(/^http/, 'ws')}/ws?debate_id=${debateId}`;
 };
 
 export const getPersonas = async () => {